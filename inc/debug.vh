@@ -0,0 +1,18 @@
+`ifndef DEBUG_PORT
+    `define DEBUG_PORT 1
+
+    // While ui_in[DEBUG_LOAD] is high the core is held like in reset and
+    // every clock loads the register picked by ui_in[2:0] from uio_in.
+    // Dropping it starts a normal opcode fetch from the loaded pc, high
+    // address byte first.
+    `define DEBUG_LOAD 7
+
+    `define DEBUG_A   3'd0
+    `define DEBUG_X   3'd1
+    `define DEBUG_Y   3'd2
+    `define DEBUG_P   3'd3
+    `define DEBUG_PCL 3'd4
+    `define DEBUG_PCH 3'd5
+    // loads nothing, only holds the core
+    `define DEBUG_HOLD 3'd7
+`endif
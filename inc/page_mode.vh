@@ -0,0 +1,17 @@
+`ifndef PAGE_MODE_PORT
+    `define PAGE_MODE_PORT 1
+
+    // While ui_in[PAGE_MODE] is high ab[15:8] only goes out when it differs
+    // from the last high byte sent, for an external latch to keep. A read
+    // in the same page takes one clock with ab[7:0] on uo_out. A clock that
+    // does send ab[15:8] for a read has uio_out[PAGE_STROBE] high, the way
+    // the low address clock has rw on uio_out[0], with uio_oe[PAGE_STROBE]
+    // set for that clock only. The core never reads uio_in in it, memory
+    // puts read data on uio in the clock with ab[7:0] (the low address
+    // clock or a page hit) and lets go of it when that clock ends, so the
+    // strobe is read in the first half of a clock and wants a pull down.
+    // Writes always send both bytes, their high clock is the first of the
+    // two with all of uio_oe set.
+    `define PAGE_MODE   6
+    `define PAGE_STROBE 1
+`endif
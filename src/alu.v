@@ -29,8 +29,8 @@ module alu (
 
     wire [6:0] ALU_flags_output_internal = next_alu_flags;
 
-    reg [7:0] next_alu_result = 8'b0;
-    reg [6:0] next_alu_flags = 7'b0;
+    reg [7:0] next_alu_result;
+    reg [6:0] next_alu_flags;
     always @(*) begin
         next_alu_flags = 7'b0;
         case(alu_op)
@@ -85,13 +85,13 @@ module alu (
             end
             `ADD: begin
                 next_alu_result = result_add[7:0];
-                next_alu_flags[`ZERO_FLAG]     = (result_add == 8'b0);
+                next_alu_flags[`ZERO_FLAG]     = (result_add == 9'b0);
                 next_alu_flags[`NEGATIVE_FLAG] = result_add[7];
                 next_alu_flags[`CARRY_FLAG] = result_add[8];
             end
             `SUB: begin
                 next_alu_result = result_sub[7:0];
-                next_alu_flags[`ZERO_FLAG]     = (result_sub == 8'b0);
+                next_alu_flags[`ZERO_FLAG]     = (result_sub == 9'b0);
                 next_alu_flags[`NEGATIVE_FLAG] = result_sub[7];
                 next_alu_flags[`CARRY_FLAG] = result_sub[8];                
             end
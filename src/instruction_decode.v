@@ -49,14 +49,14 @@ localparam S_BRANCH_CHECK   = 4'd13;
 
 //BUFFER OPERATIONS
 
-reg [3:0] STATE      = S_IDLE;
-reg [3:0] NEXT_STATE = S_IDLE;
-reg [15:0] MEMORY_ADDRESS_INTERNAL  = 16'b0;
-reg [2:0] ADDRESSING=0;
-reg [7:0] OPCODE=0;
-reg [7:0] INSTRUCTION=0;
-reg [6:0] PROCESS_STATUS_WRITE = 0;
-reg [6:0] NEXT_PROCESS_STATUS_WRITE = 0;
+reg [3:0] STATE;
+reg [3:0] NEXT_STATE;
+reg [15:0] MEMORY_ADDRESS_INTERNAL;
+reg [2:0] ADDRESSING;
+reg [7:0] OPCODE;
+reg [7:0] INSTRUCTION;
+reg [6:0] PROCESS_STATUS_WRITE;
+reg [6:0] NEXT_PROCESS_STATUS_WRITE;
 always @(*) begin
     memory_address = 16'b0;
     NEXT_STATE = STATE;
@@ -75,6 +75,11 @@ always @(*) begin
     index_register_X_enable = `BUF_IDLE_THREE;
     index_register_Y_enable = `BUF_IDLE_THREE;
     case(STATE)
+    // S_IDLE only fetches the opcode at pc. An instruction whose last state
+    // already has pc on the bus and doesn't write (implied, ALU_TMX of a
+    // read, PC_LOAD, BRANCH_CHECK) fetches the next opcode itself and goes
+    // straight to S_OPCODE_READ. Only after reset and the write of a store
+    // or read-modify-write do we come through here.
     S_IDLE: begin
         NEXT_STATE = S_OPCODE_READ;
     end
@@ -83,38 +88,38 @@ always @(*) begin
         // In this state, we just need to increment the PC and decide where to go next.
         // The actual loading of OPCODE and ADDRESSING will happen in the clocked block below.
         if(INSTRUCTION == `OP_NOP) begin
-            NEXT_STATE = S_IDLE; // NOP is a no-operation, so we just stay idle.
+            NEXT_STATE = S_OPCODE_READ; // NOP is a no-operation, so we just fetch the next opcode.
         end else if(INSTRUCTION == `OP_SEC) begin
 	        processor_status_register_value[7] = 1;
 	        processor_status_register_value[`CARRY_FLAG] = 1;
             processor_status_register_write[`CARRY_FLAG] = 1;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
         end else if(INSTRUCTION == `OP_CLC) begin
 	        processor_status_register_value[7] = 1;
 	        processor_status_register_value[`CARRY_FLAG] = 0;
             processor_status_register_write[`CARRY_FLAG] = 1;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
         end else if(INSTRUCTION == `OP_CLV) begin
 	        processor_status_register_value[7] = 1;
 	        processor_status_register_value[`OVERFLOW_FLAG] = 0;
             processor_status_register_write[`OVERFLOW_FLAG] = 1;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
         end else if(INSTRUCTION == `OP_TAX) begin
             index_register_X_enable = `BUF_LOAD1_THREE;
             accumulator_enable = `BUF_STORE1_THREE;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
         end else if(INSTRUCTION == `OP_TAY) begin
             index_register_Y_enable = `BUF_LOAD1_THREE;
             accumulator_enable = `BUF_STORE1_THREE;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
         end else if(INSTRUCTION == `OP_TXA) begin
             index_register_X_enable = `BUF_STORE1_THREE;
             accumulator_enable = `BUF_LOAD1_THREE;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
         end else if(INSTRUCTION == `OP_TYA) begin
             index_register_Y_enable = `BUF_STORE1_THREE;
             accumulator_enable = `BUF_LOAD1_THREE;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
         end else if (
                      INSTRUCTION == `OP_LD_Y_IMM || INSTRUCTION == `OP_LD_X_IMM || INSTRUCTION == `OP_LD_A_IMM ||
                      INSTRUCTION == `OP_ORA_IMM || INSTRUCTION == `OP_AND_IMM || INSTRUCTION == `OP_EOR_IMM ||
@@ -318,17 +323,17 @@ always @(*) begin
         processor_status_register_write = PROCESS_STATUS_WRITE;
         if(OPCODE == `OP_LD_X_ZPG || OPCODE == `OP_LD_X_ABS || OPCODE == `OP_LD_X_IMM) begin
             index_register_X_enable = `BUF_LOAD2_THREE;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
             alu_enable = `TMX;
         end
         else if(OPCODE == `OP_LD_Y_ZPG || OPCODE == `OP_LD_Y_ABS || OPCODE == `OP_LD_Y_IMM) begin
             index_register_Y_enable = `BUF_LOAD2_THREE;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
             alu_enable = `TMX;
         end
         else if(OPCODE == `OP_LD_A_ZPG || OPCODE == `OP_LD_A_ABS || OPCODE == `OP_LD_A_IMM ) begin
             accumulator_enable = `BUF_LOAD2_THREE;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
             alu_enable = `TMX;
         end
         else if(
@@ -339,7 +344,7 @@ always @(*) begin
             OPCODE == `OP_SBC_ZPG || OPCODE == `OP_SBC_ABS || OPCODE == `OP_SBC_IMM 
             ) begin
             accumulator_enable = `BUF_LOAD2_THREE;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
             alu_enable = `TMX;
         end 
         else if (
@@ -348,7 +353,7 @@ always @(*) begin
                 OPCODE == `OP_CPY_ZPG || OPCODE == `OP_CPY_ABS || OPCODE == `OP_CPY_IMM
                 ) begin
             alu_enable = `TMX;
-            NEXT_STATE = S_IDLE;
+            NEXT_STATE = S_OPCODE_READ;
         end
         else if(OPCODE == `OP_ST_X_ZPG || OPCODE == `OP_ST_X_ABS) begin
             index_register_X_enable = `BUF_STORE2_THREE;
@@ -368,12 +373,12 @@ always @(*) begin
 	else if(OPCODE == `OP_INX || OPCODE == `OP_DEX) begin
 	    index_register_X_enable = `BUF_LOAD2_THREE;
         alu_enable = `TMX;
-	    NEXT_STATE = S_IDLE;
+	    NEXT_STATE = S_OPCODE_READ;
 	end
 	else if(OPCODE == `OP_INY || OPCODE == `OP_DEY) begin
 	    index_register_Y_enable = `BUF_LOAD2_THREE;
             alu_enable = `TMX;
-	    NEXT_STATE = S_IDLE;
+	    NEXT_STATE = S_OPCODE_READ;
 	end
         else if(ADDRESSING == `ADR_ZPG || ADDRESSING == `ADR_ZPG_X || ADDRESSING == `ADR_ABS) begin
             data_buffer_enable = `BUF_LOAD_TWO;
@@ -382,7 +387,7 @@ always @(*) begin
         end else if(ADDRESSING == `ADR_A) begin
             accumulator_enable = `BUF_LOAD2_THREE;
             alu_enable = `TMX;
-	    NEXT_STATE = S_IDLE;
+	    NEXT_STATE = S_OPCODE_READ;
         end
     end 
     S_DBUF_OUTPUT: begin
@@ -424,7 +429,7 @@ always @(*) begin
     end
     S_PC_LOAD: begin
         pc_enable = `BUF_LOAD1_THREE;
-        NEXT_STATE = S_IDLE;
+        NEXT_STATE = S_OPCODE_READ;
         memory_address = MEMORY_ADDRESS_INTERNAL;
     end
     S_BRANCH_CHECK: begin
@@ -449,7 +454,7 @@ always @(*) begin
         end else begin
             pc_enable = `PC_INC_ONE;
         end
-        NEXT_STATE = S_IDLE;
+        NEXT_STATE = S_OPCODE_READ;
     end
     default: NEXT_STATE = S_IDLE;
     endcase
@@ -480,6 +485,10 @@ always @(posedge clk or negedge rst_n) begin
                 ADDRESSING <= `ADR_A;
             end else if (instruction[4:2] == `ADR_ZPG_X) begin
                 ADDRESSING <= `ADR_ZPG_X;
+            end else begin
+                // LDX/LDY/CPX/CPY #imm, keeping the ADR_REL of a branch
+                // before them would send them to S_BRANCH_CHECK
+                ADDRESSING <= 3'b000;
             end
         end else if(NEXT_STATE == S_ABS_LB || NEXT_STATE == S_ZPG_ABS_ADR_READ) begin
             MEMORY_ADDRESS_INTERNAL <= {8'h00, instruction};
@@ -489,6 +498,6 @@ always @(posedge clk or negedge rst_n) begin
     end
 end
 
-wire _unused = &{irq, nmi};
+wire _unused = &{irq, nmi, processor_status_register_read[5:2]};
 
 endmodule
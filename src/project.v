@@ -6,6 +6,8 @@
  
 `include "../inc/alu_ops.vh"
 `include "../inc/buf_instructions.vh"
+`include "../inc/debug.vh"
+`include "../inc/page_mode.vh"
 
 
   //localparam BUF_IDLE_TWO      = 2'b00;
@@ -63,37 +65,60 @@ module tt_um_6502 (
 
   wire [15:0] ab;
 
-  reg [7:0] input_data_latch = 0;
+  reg [7:0] input_data_latch;
   wire [7:0] bus1;
   wire [7:0] bus2;
-  reg [7:0] data_bus_buffer=8'b0;
+  reg [7:0] data_bus_buffer;
 
-  reg [15:0] pc=0;
+  reg [15:0] pc;
+  wire [15:0] next_pc;
   wire [15:0] memory_address;
-  reg [7:0] accumulator=0;
-  reg [7:0] index_register_x=0;
-  reg [7:0] index_register_y=0;
+  reg [7:0] accumulator;
+  reg [7:0] index_register_x;
+  reg [7:0] index_register_y;
   wire [7:0] instruction_register;
-  reg [6:0] processor_status_register=0;
+  reg [6:0] processor_status_register;
 
-  reg [7:0] next_accumulator=0;
-  reg [7:0] next_index_register_x=0;
-  reg [7:0] next_index_register_y=0;
-  reg [7:0] next_data_bus_buffer=0;
-  reg [6:0] next_processor_status_register=0;
+  reg [7:0] next_accumulator;
+  reg [7:0] next_index_register_x;
+  reg [7:0] next_index_register_y;
+  reg [7:0] next_data_bus_buffer;
+  reg [6:0] next_processor_status_register;
+  wire [7:0] accumulator_in;
+  wire [7:0] index_register_x_in;
+  wire [7:0] index_register_y_in;
+  wire [7:0] data_bus_buffer_in;
+  wire [6:0] processor_status_register_in;
+  reg [7:0] read_data;
 
   wire [7:0] ALU_inputA;
   wire [7:0] ALU_inputB;
 
   wire [7:0] ALU_output;
   wire [6:0] ALU_flags_output;
-  reg clk_enable = 1;
+  reg clk_enable;
+
+  // debug state load, see inc/debug.vh
+  wire debug_load = ui_in[`DEBUG_LOAD];
+  wire core_rst_n = rst_n & ~debug_load;
+
+  // page mode, see inc/page_mode.vh. A read in the page the external latch
+  // already holds skips the high address clock, so that clock does the
+  // work of both.
+  wire page_mode = ui_in[`PAGE_MODE];
+  reg [7:0] page;
+  reg page_valid;
+  wire page_hit = page_mode && page_valid && rw && clk_enable == 0 && !debug_load && ab[15:8] == page;
+  wire address_high = clk_enable == 0 && !page_hit;
+  // STATE and the registers move at the end of the low address clock or
+  // of a page hit
+  wire cycle_end = clk_enable || page_hit;
 
   instruction_decode instructionDecode(
     .instruction                   (instruction_register),
     .clk                           (clk),
-    .clk_enable                    (clk_enable),
-    .rst_n                         (rst_n),
+    .clk_enable                    (cycle_end),
+    .rst_n                         (core_rst_n),
     .irq                           (irq),
     .nmi                           (nmi),
     .processor_status_register_read(processor_status_register_read),
@@ -125,6 +150,14 @@ module tt_um_6502 (
 
   interrupt_logic interruptLogic(clk, res_in, irq_in, nmi_in, res, irq, nmi);
 
+  // pc moves at the end of the high address phase, so the address bus
+  // already shows next_pc then, otherwise an access that crosses a page
+  // would go out as {old ab[15:8], new ab[7:0]}
+  assign next_pc = (pc_enable == `PC_INC_ONE)?pc + 1:
+                   (pc_enable == `BUF_LOAD1_THREE)?memory_address:
+                   (pc_enable == `PC_TAKE_BRANCH)?pc + {8'h00, bus1}:
+                   pc;
+
   //putting data on the bus 1
   assign bus1 = (input_data_latch_enable == `BUF_STORE_TWO)?input_data_latch:
                 (accumulator_enable == `BUF_STORE1_THREE)?accumulator:
@@ -138,6 +171,23 @@ module tt_um_6502 (
 		(index_register_y_enable == `BUF_STORE2_THREE)?index_register_y:
 		0;
 
+  // what the registers take from the buses in this bus cycle
+  assign accumulator_in = (accumulator_enable == `BUF_LOAD1_THREE)?bus1:
+                          (accumulator_enable == `BUF_LOAD2_THREE)?bus2:
+                          accumulator;
+  assign index_register_x_in = (index_register_x_enable == `BUF_LOAD1_THREE)?bus1:
+                               (index_register_x_enable == `BUF_LOAD2_THREE)?bus2:
+                               index_register_x;
+  assign index_register_y_in = (index_register_y_enable == `BUF_LOAD1_THREE)?bus1:
+                               (index_register_y_enable == `BUF_LOAD2_THREE)?bus2:
+                               index_register_y;
+  assign data_bus_buffer_in = (data_buffer_enable == `BUF_LOAD_TWO)?bus2:data_bus_buffer;
+  //alu stuff
+  assign processor_status_register_in =
+    (ALU_op != `NOP && ALU_op == `TMX)?(ALU_flags_output & processor_status_register_write) | (processor_status_register & ~processor_status_register_write):
+    (processor_status_register_value[7]==1)?(processor_status_register_value[6:0] & processor_status_register_write) | (processor_status_register & ~processor_status_register_write):
+    processor_status_register;
+
   always @(posedge clk or negedge rst_n) begin
     if (rst_n == 0) begin
       // Reset all state elements to a known value
@@ -153,44 +203,49 @@ module tt_um_6502 (
     next_index_register_y <= 0;
     next_data_bus_buffer <= 0;
     next_processor_status_register <= 0;
+    read_data <= 0;
+    page <= 0;
+    page_valid <= 0;
     clk_enable <= 1;
-    end else begin
-    clk_enable <= ~clk_enable;
+    end else if (debug_load) begin
+    // hold the core like in reset and load one register from uio_in, the
+    // next_* copies have to match so the first cycle after doesn't undo it.
+    // Leaving in the high address phase puts the whole pc on the bus before
+    // the first opcode fetch, unlike coming out of reset.
+    clk_enable <= 0;
+    page_valid <= 0;
     next_accumulator <= accumulator;
     next_index_register_x <= index_register_x;
     next_index_register_y <= index_register_y;
-    next_data_bus_buffer <= data_bus_buffer;
-    //reading data from the bus 1
-    if(accumulator_enable == `BUF_LOAD1_THREE) begin
-       next_accumulator <= bus1;
-    end
-    if(index_register_x_enable == `BUF_LOAD1_THREE) begin
-      next_index_register_x <= bus1;
-    end
-    if(index_register_y_enable == `BUF_LOAD1_THREE) begin
-      next_index_register_y <= bus1;
-    end
-    //reading data from the bus 2
-    if(data_buffer_enable == `BUF_LOAD_TWO) begin
-      next_data_bus_buffer <= bus2;
-    end
-    if(accumulator_enable == `BUF_LOAD2_THREE) begin
-       next_accumulator <= bus2;
-    end
-    if(index_register_x_enable == `BUF_LOAD2_THREE) begin
-      next_index_register_x <= bus2;
-    end
-    if(index_register_y_enable == `BUF_LOAD2_THREE) begin
-      next_index_register_y <= bus2;
-    end
-    //alu stuff
-    if(ALU_op != `NOP && ALU_op == `TMX) begin
-      next_processor_status_register <= (ALU_flags_output & processor_status_register_write) | (processor_status_register & ~processor_status_register_write);
-    end else if (processor_status_register_value[7]==1) begin
-      next_processor_status_register <= (processor_status_register_value[6:0] & processor_status_register_write) | (processor_status_register & ~processor_status_register_write);
+    next_processor_status_register <= processor_status_register;
+    case (ui_in[2:0])
+      `DEBUG_A: begin
+        accumulator <= uio_in;
+        next_accumulator <= uio_in;
+      end
+      `DEBUG_X: begin
+        index_register_x <= uio_in;
+        next_index_register_x <= uio_in;
+      end
+      `DEBUG_Y: begin
+        index_register_y <= uio_in;
+        next_index_register_y <= uio_in;
+      end
+      `DEBUG_P: begin
+        processor_status_register <= uio_in[6:0];
+        next_processor_status_register <= uio_in[6:0];
+      end
+      `DEBUG_PCL: pc <= {pc[15:8], uio_in};
+      `DEBUG_PCH: pc <= {uio_in, pc[7:0]};
+      default: ;
+    endcase
     end else begin
-      next_processor_status_register <= processor_status_register;
-    end
+    clk_enable <= address_high;
+    next_accumulator <= accumulator_in;
+    next_index_register_x <= index_register_x_in;
+    next_index_register_y <= index_register_y_in;
+    next_data_bus_buffer <= data_bus_buffer_in;
+    next_processor_status_register <= processor_status_register_in;
     if(clk_enable==0)begin
       if (rst_n == 0) begin
         processor_status_register <= 0;
@@ -199,19 +254,15 @@ module tt_um_6502 (
 
       end else begin
         if(input_data_latch_enable == 1) begin
-          input_data_latch <= uio_in;
-        end
-        if(pc_enable == `PC_INC_ONE) begin
-          pc <= pc + 1;
-        end
-        else if(pc_enable == `BUF_LOAD1_THREE) begin
-          pc <= memory_address;
-        end
-        else if(pc_enable == `PC_TAKE_BRANCH) begin
-          pc <= pc + $signed(bus1);
+          // the read of the clock before, uio_in can have the page strobe on it now
+          input_data_latch <= read_data;
         end
+        pc <= next_pc;
+        page <= ab[15:8];
+        page_valid <= 1;
       end
-    end else begin
+    end
+    if(clk_enable==1) begin
       if (rst_n == 0) begin
         accumulator <= 0;
         data_bus_buffer <= 0;
@@ -224,7 +275,16 @@ module tt_um_6502 (
         data_bus_buffer <= next_data_bus_buffer;
         index_register_x <= next_index_register_x;
         index_register_y <= next_index_register_y;
+        read_data <= uio_in;
       end
+    end else if(page_hit) begin
+      // no low address clock to wait for, take what the buses carry now
+      processor_status_register <= processor_status_register_in;
+      accumulator <= accumulator_in;
+      data_bus_buffer <= data_bus_buffer_in;
+      index_register_x <= index_register_x_in;
+      index_register_y <= index_register_y_in;
+      read_data <= uio_in;
     end
   end
   end
@@ -235,18 +295,19 @@ module tt_um_6502 (
   assign nmi_in = 0;
   assign res_in = 0;
   assign processor_status_register_read = processor_status_register;
-  wire _unused = &{ena, 1'b0, dbe, res, rdy, stack_pointer_register_enable, ui_in, processor_status_register_rw};
+  wire _unused = &{ena, 1'b0, dbe, res, rdy, stack_pointer_register_enable, ui_in[5:3], processor_status_register_rw};
 
   // All output pins must be assigned. If not used, assign to 0.
-  assign uo_out = (clk_enable==0)?ab[15:8]:ab[7:0];
-  assign uio_out = (clk_enable==0)?(data_buffer_enable == 2'd2 ? data_bus_buffer : 8'b0 ) : {7'b0,rw} ;
-  assign uio_oe  = rw?8'h00:8'hff;
+  assign uo_out = address_high?ab[15:8]:ab[7:0];
+  assign uio_out = address_high?(data_buffer_enable == 2'd2 ? data_bus_buffer : {7'b0, page_mode} << `PAGE_STROBE ) : {7'b0,rw} ;
+  // the page strobe only drives uio in a read's high clock, where nothing reads uio_in
+  assign uio_oe  = rw?({7'b0, page_mode && address_high} << `PAGE_STROBE):8'hff;
 
 assign ALU_inputA = bus1;
 assign ALU_inputB = bus2;
 
 // The address bus mux
-  assign ab = (address_select==2'b00)?pc:
+  assign ab = (address_select==2'b00)?(clk_enable==0 ? next_pc : pc):
 	    	(address_select==2'b01)?memory_address:
 		(address_select==2'b10)?{8'h0, ALU_output}:
 		0;
@@ -0,0 +1,127 @@
+import functools
+import hashlib
+import os
+import re
+
+import numpy as np
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ALU_OPS_FILE = os.path.join(TEST_DIR, "..", "inc", "alu_ops.vh")
+CACHE_DIR = os.path.join(TEST_DIR, ".cache")
+
+# bit positions from inc/status_register.vh
+CARRY_FLAG = 1 << 0
+ZERO_FLAG = 1 << 1
+NEGATIVE_FLAG = 1 << 6
+
+RESULT = 0
+FLAGS = 1
+
+
+def parse_alu_ops(path=ALU_OPS_FILE):
+    # every `define in alu_ops.vh except the NOP/TMX bus controls
+    with open(path) as f:
+        ops = re.findall(r"`define\s+(\w+)\s+5'b([01]+)", f.read())
+    return {name: int(bits, 2) for name, bits in ops if name not in ("NOP", "TMX")}
+
+
+ALU_OPS = parse_alu_ops()
+OP_NAMES = list(ALU_OPS)
+INDEX = {name: i for i, name in enumerate(OP_NAMES)}
+
+
+def _flags(result, carry=None, zero=None):
+    flags = np.where(result == 0 if zero is None else zero, ZERO_FLAG, 0)
+    flags |= np.where(result & 0x80, NEGATIVE_FLAG, 0)
+    if carry is not None:
+        flags |= carry
+    return flags
+
+
+def build_table():
+    # table[op, inputA, inputB, carry_in] = (ALU_output, ALU_flags_output)
+    a = np.arange(256, dtype=np.int32)[:, None, None]
+    b = np.arange(256, dtype=np.int32)[None, :, None]
+    c = np.arange(2, dtype=np.int32)[None, None, :]
+    a, b, c = np.broadcast_arrays(a, b, c)
+
+    table = np.zeros((len(OP_NAMES), 256, 256, 2, 2), dtype=np.uint8)
+    for name, i in INDEX.items():
+        if name == "ASL":
+            result = (a << 1) & 0xFF
+            flags = _flags(result, carry=a >> 7)
+        elif name == "LSR":
+            result = a >> 1
+            flags = _flags(result, carry=a & 1)
+        elif name == "ROL":
+            result = ((a << 1) | (a >> 7)) & 0xFF
+            flags = _flags(result, carry=a >> 7)
+        elif name == "ROR":
+            result = (a >> 1) | ((a & 1) << 7)
+            flags = _flags(result, carry=a & 1)
+        elif name == "AND":
+            result = a & b
+            flags = _flags(result)
+        elif name == "OR":
+            result = a | b
+            flags = _flags(result)
+        elif name == "XOR":
+            result = a ^ b
+            flags = _flags(result)
+        elif name == "INC":
+            result = (a + 1) & 0xFF
+            flags = _flags(result)
+        elif name == "DEC":
+            result = (a - 1) & 0xFF
+            flags = _flags(result)
+        elif name in ("ADD", "SUB"):
+            # the zero flag looks at all 9 bits of the sum
+            total = (a + b + c) if name == "ADD" else (a - b - c) & 0x1FF
+            result = total & 0xFF
+            flags = _flags(result, carry=total >> 8, zero=total == 0)
+        elif name == "CMP":
+            result = a
+            difference = (b - a) & 0xFF
+            flags = _flags(difference, carry=(b >= a).astype(np.int32))
+        elif name == "FLG":
+            result = a
+            flags = _flags(result)
+        else:
+            raise ValueError(f"no reference for ALU op {name}")
+        table[i, ..., RESULT] = result
+        table[i, ..., FLAGS] = flags
+    return table
+
+
+def _cache_path():
+    digest = hashlib.sha1()
+    for path in (__file__, ALU_OPS_FILE):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return os.path.join(CACHE_DIR, f"alu_table_{digest.hexdigest()[:12]}.npy")
+
+
+@functools.lru_cache(maxsize=None)
+def load():
+    path = _cache_path()
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, build_table())
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+def lookup(op, a, b=0, carry=0):
+    # op is the name from alu_ops.vh, a/b/carry can be ints or arrays
+    entry = load()[INDEX[op], a, b, carry]
+    return entry[..., RESULT], entry[..., FLAGS]
+
+
+def mismatches(op, a, b, carry, results, flags=None):
+    # indices of the vectors where results (and flags if given) disagree
+    expected_results, expected_flags = lookup(op, a, b, carry)
+    bad = np.asarray(results) != expected_results
+    if flags is not None:
+        bad |= np.asarray(flags) != expected_flags
+    return np.flatnonzero(bad)
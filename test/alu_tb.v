@@ -0,0 +1,82 @@
+`default_nettype none
+`timescale 1ns / 1ps
+
+/* Standalone testbench for the alu, run with make TOP=alu (test_alu.py).
+
+   There are 256 copies of the alu side by side, lane n has inputB = n, so a
+   sweep of every inputA and carry for one alu_op covers all of inputB at
+   the same time and takes 512 clocks. The registered outputs of each vector
+   are stored a clock later in results, indexed {inputA, inputB, carry} like
+   alu_table.py, and the table is written to results_file once the sweep is
+   done.
+*/
+module alu_tb ();
+
+  reg clk;
+  reg start;
+  reg [4:0] alu_op;
+  reg done;
+
+  reg [8:0] vector;  // {inputA, carry}
+  reg running;
+  reg capture;
+  reg [8:0] captured;
+  reg write_results;
+  // {ALU_flags_output, ALU_output}
+  reg [14:0] results[0:(1 << 17) - 1];
+  reg [8*64-1:0] results_file;
+
+  initial begin
+    done = 0;
+    running = 0;
+    capture = 0;
+    write_results = 0;
+    if (!$value$plusargs("alu_results=%s", results_file))
+      results_file = "sim_build/alu_results.hex";
+  end
+
+  wire [7:0] lane_output[0:255];
+  wire [6:0] lane_flags[0:255];
+
+  genvar lane;
+  generate
+    for (lane = 0; lane < 256; lane = lane + 1) begin : lanes
+      // a genvar can't be part-selected
+      localparam [7:0] B = lane;
+      alu ALU (
+          .clk             (clk),
+          .alu_op          (alu_op),
+          .inputA          (vector[8:1]),
+          .inputB          (B),
+          .status_flags_in ({6'b0, vector[0]}),
+          .ALU_output      (lane_output[lane]),
+          .ALU_flags_output(lane_flags[lane])
+      );
+    end
+  endgenerate
+
+  integer i;
+  always @(posedge clk) begin
+    capture  <= running;
+    captured <= vector;
+    if (start) begin
+      vector <= 0;
+      running <= 1;
+      done <= 0;
+    end else if (running) begin
+      vector <= vector + 1;
+      if (vector == 9'h1FF) running <= 0;
+    end
+    if (capture) begin
+      for (i = 0; i < 256; i = i + 1)
+        results[{captured[8:1], i[7:0], captured[0]}] <= {lane_flags[i], lane_output[i]};
+      if (captured == 9'h1FF) write_results <= 1;
+    end
+    if (write_results) begin
+      $writememh(results_file, results);
+      write_results <= 0;
+      done <= 1;
+    end
+  end
+
+endmodule
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import re
+
+from opcodes import BY_NAME, OPCODE_FILE
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(TEST_DIR, ".cache")
+
+# Source is one statement per line, ; starts a comment:
+#
+#   count = $fb            ; constants
+#           .org $0000     ; where the next byte goes, gaps are zero filled
+#   start:  nop            ; labels, on their own line or before a statement
+#   loop:   cmp count
+#           bne add        ; branches take the target, not the offset
+#           jmp done
+#   add:    adc $fa
+#           dec count
+#           jmp loop
+#           .byte 1, 2, $ff
+#           .word done     ; little endian
+#           .fill 4, $ea   ; count and optional value
+#
+# Operands are #imm, A, addr or addr,X. An address that fits in a byte and
+# is known when the line is first seen picks ZPG over ABS, a forward
+# reference always picks ABS. Expressions are numbers ($hex, %binary or
+# decimal), symbols and * for the address of the statement, joined with +
+# and -, and < or > in front takes the low or high byte.
+
+_LINE = re.compile(
+    r"^\s*(?:(?P<label>[A-Za-z_]\w*):)?\s*"
+    r"(?:(?P<name>[A-Za-z_]\w*)\s*=\s*(?P<value>[^;]+?)"
+    r"|(?P<op>\.?[A-Za-z]+)(?:\s+(?P<args>[^;]*?))?)?\s*(?:;.*)?$"
+)
+_TERM = re.compile(
+    r"\s*([+-]?)\s*([<>]?)\s*(\$[0-9A-Fa-f]+|%[01]+|\d+|[A-Za-z_]\w*|\*)"
+)
+
+
+MNEMONICS = {mnemonic for mnemonic, _ in BY_NAME}
+
+
+class AssemblyError(ValueError):
+    pass
+
+
+class Program:
+    __slots__ = ("origin", "image", "symbols")
+
+    def __init__(self, origin, image, symbols):
+        self.origin = origin
+        self.image = image
+        self.symbols = symbols
+
+    def load(self, memory):
+        # memory is a memory.Memory, a model.Cpu's mem or anything with load()
+        if hasattr(memory, "load"):
+            memory.load(self.image, self.origin)
+        else:
+            memory[self.origin : self.origin + len(self.image)] = self.image
+
+    def __getitem__(self, symbol):
+        return self.symbols[symbol]
+
+    def __repr__(self):
+        return f"Program({self.origin:04x}, {len(self.image)} bytes)"
+
+
+def _number(text):
+    if text.startswith("$"):
+        return int(text[1:], 16)
+    if text.startswith("%"):
+        return int(text[1:], 2)
+    return int(text)
+
+
+def _evaluate(text, symbols, pc):
+    # None while a symbol is still undefined (a forward reference)
+    text = text.strip()
+    total = 0
+    position = 0
+    while position < len(text):
+        match = _TERM.match(text, position)
+        if match is None or (position and not match.group(1)):
+            raise AssemblyError(f"bad expression {text!r}")
+        sign, byte, term = match.groups()
+        position = match.end()
+        if term == "*":
+            value = pc
+        elif term[0] in "$%" or term[0].isdigit():
+            value = _number(term)
+        elif term in symbols:
+            value = symbols[term]
+        else:
+            return None
+        if byte == "<":
+            value &= 0xFF
+        elif byte == ">":
+            value = (value >> 8) & 0xFF
+        total += -value if sign == "-" else value
+    if not text:
+        raise AssemblyError("missing expression")
+    return total
+
+
+def _arguments(args):
+    return [arg.strip() for arg in args.split(",")] if args else []
+
+
+def _mode(mnemonic, operand, symbols, pc):
+    # (mode, expression) for an instruction, using only what pass 1 knows
+    def has(mode):
+        return (mnemonic, mode) in BY_NAME
+
+    if mnemonic not in MNEMONICS:
+        raise AssemblyError(f"unknown instruction {mnemonic}")
+    if not operand:
+        for mode in ("IMPL", "A"):
+            if has(mode):
+                return mode, None
+        raise AssemblyError(f"{mnemonic} needs an operand")
+    if operand.upper() == "A" and has("A"):
+        return "A", None
+    if operand.startswith("#"):
+        return "IMM", operand[1:]
+    if has("REL"):
+        return "REL", operand
+    expression, _, index = operand.partition(",")
+    if index:
+        if index.strip().upper() != "X":
+            raise AssemblyError(f"only ,X indexing is supported, not {operand!r}")
+        return "ZPG_X", expression
+    value = _evaluate(expression, symbols, pc)
+    if has("ZPG") and value is not None and 0 <= value <= 0xFF:
+        return "ZPG", expression
+    if has("ABS"):
+        return "ABS", expression
+    return "ZPG", expression
+
+
+def _directive_size(op, args, symbols, pc):
+    if op == ".byte":
+        return len(args)
+    if op == ".word":
+        return 2 * len(args)
+    if op == ".fill":
+        count = _evaluate(args[0], symbols, pc) if args else None
+        if count is None:
+            raise AssemblyError(".fill needs a count known up front")
+        return count
+    raise AssemblyError(f"unknown directive {op}")
+
+
+def _parse(source):
+    statements = []
+    for number, line in enumerate(source.splitlines(), 1):
+        match = _LINE.match(line)
+        if match is None:
+            raise AssemblyError(f"line {number}: cannot parse {line.strip()!r}")
+        statements.append((number, match))
+    return statements
+
+
+def _assemble(source, origin):
+    symbols = {}
+    pc = origin
+    lines = []
+
+    # pass 1 places every label and fixes the size of every statement
+    for number, match in _parse(source):
+        try:
+            label, name, value, op, args = match.group(
+                "label", "name", "value", "op", "args"
+            )
+            if label:
+                if label in symbols:
+                    raise AssemblyError(f"{label} is defined twice")
+                symbols[label] = pc
+            if name:
+                if name in symbols:
+                    raise AssemblyError(f"{name} is defined twice")
+                result = _evaluate(value, symbols, pc)
+                if result is None:
+                    raise AssemblyError(f"{name} uses a symbol defined later")
+                symbols[name] = result
+            elif op and op.lower() == ".org":
+                pc = _evaluate(args or "", symbols, pc)
+                if pc is None:
+                    raise AssemblyError(".org uses a symbol defined later")
+            elif op and op.startswith("."):
+                args = _arguments(args)
+                lines.append((number, pc, op.lower(), None, args))
+                pc += _directive_size(op.lower(), args, symbols, pc)
+            elif op:
+                mnemonic = op.upper()
+                mode, expression = _mode(mnemonic, (args or "").strip(), symbols, pc)
+                if (mnemonic, mode) not in BY_NAME:
+                    raise AssemblyError(f"{mnemonic} has no {mode} form")
+                opcode = BY_NAME[mnemonic, mode]
+                lines.append((number, pc, opcode, mode, expression))
+                pc += opcode.size
+        except AssemblyError as error:
+            raise AssemblyError(f"line {number}: {error}") from None
+
+    # pass 2 fills in the bytes now every symbol is known
+    memory = {}
+    for number, pc, op, mode, operand in lines:
+        try:
+            memory.update(_encode(pc, op, mode, operand, symbols))
+        except AssemblyError as error:
+            raise AssemblyError(f"line {number}: {error}") from None
+
+    if not memory:
+        return Program(origin, b"", symbols)
+    low = min(memory)
+    high = max(memory)
+    if high > 0xFFFF or low < 0:
+        raise AssemblyError(f"program runs outside memory ({low:#x} to {high:#x})")
+    image = bytearray(high - low + 1)
+    for address, value in memory.items():
+        image[address - low] = value
+    return Program(low, bytes(image), symbols)
+
+
+def _resolve(expression, symbols, pc):
+    value = _evaluate(expression, symbols, pc)
+    if value is None:
+        raise AssemblyError(f"undefined symbol in {expression!r}")
+    return value
+
+
+def _byte(value, what):
+    if not -0x80 <= value <= 0xFF:
+        raise AssemblyError(f"{what} {value:#x} does not fit in a byte")
+    return value & 0xFF
+
+
+def _encode(pc, op, mode, operand, symbols):
+    # address -> byte for one statement
+    if mode is None:
+        if op == ".byte":
+            values = [_byte(_resolve(arg, symbols, pc), "value") for arg in operand]
+        elif op == ".word":
+            values = []
+            for arg in operand:
+                word = _resolve(arg, symbols, pc) & 0xFFFF
+                values += [word & 0xFF, word >> 8]
+        else:
+            count = _resolve(operand[0], symbols, pc)
+            fill = _resolve(operand[1], symbols, pc) if len(operand) > 1 else 0
+            values = [_byte(fill, "fill value")] * count
+        return {pc + i: value for i, value in enumerate(values)}
+
+    values = [op.value]
+    if mode == "REL":
+        # the RTL lands on opcode address + 1 + offset, with no sign extension
+        offset = _resolve(operand, symbols, pc) - (pc + 1)
+        if not 0 <= offset <= 0xFF:
+            raise AssemblyError(
+                f"branch target {offset:+d} from {pc + 1:04x} is out of range, "
+                "branches only go 0 to 255 bytes forwards"
+            )
+        values.append(offset)
+    elif mode in ("IMM", "ZPG", "ZPG_X"):
+        values.append(_byte(_resolve(operand, symbols, pc), mode))
+    elif mode == "ABS":
+        address = _resolve(operand, symbols, pc)
+        if not 0 <= address <= 0xFFFF:
+            raise AssemblyError(f"address {address:#x} is out of range")
+        values += [address & 0xFF, address >> 8]
+    return {pc + i: value for i, value in enumerate(values)}
+
+
+def _digest():
+    # assembled programs are only reused while the assembler and opcodes are
+    digest = hashlib.sha1()
+    for path in (__file__, os.path.join(TEST_DIR, "opcodes.py"), OPCODE_FILE):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+_DIGEST = _digest()
+_CACHE = {}
+
+
+def assemble(source, origin=0, cache=True):
+    # Program for source, cached by the hash of the source and the origin in
+    # memory and in .cache/asm so a generated workload is only assembled once
+    # across the simulator processes that load it.
+    key = hashlib.sha1(f"{_DIGEST}\0{origin}\0{source}".encode()).hexdigest()
+    if cache and key in _CACHE:
+        return _CACHE[key]
+    path = os.path.join(CACHE_DIR, "asm", f"{key}.json")
+    if cache and os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        program = Program(
+            saved["origin"], bytes.fromhex(saved["image"]), saved["symbols"]
+        )
+    else:
+        program = _assemble(source, origin)
+        if cache:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {
+                        "origin": program.origin,
+                        "image": program.image.hex(),
+                        "symbols": program.symbols,
+                    },
+                    f,
+                )
+            os.replace(tmp_path, path)
+    if cache:
+        _CACHE[key] = program
+    return program
@@ -0,0 +1,172 @@
+# Throughput benchmarks, run with python run_bench.py rather than directly.
+#
+# Every benchmark records the wall time and simulated time around its
+# workload, the simulated clock cycles per wall second they give, and the
+# peak RSS of the simulator process. The numbers are written to
+# BENCH_RESULTS as each benchmark finishes.
+#
+# bench_cpi runs some programs through the memory model and measures the
+# cycles per instruction of each with cpi.CpiSampler, then again with the
+# page mode bus of inc/page_mode.vh (as "<name>_paged"). Their totals go
+# into BENCH_RESULTS as well, the table per opcode over all of them to
+# CPI_TABLE as text, and the page mode one next to it.
+
+import json
+import os
+import random
+import resource
+import time
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import with_timeout
+from cocotb.utils import get_sim_time
+
+import helper
+import test as suite
+from assembler import assemble
+from cpi import CpiSampler, CpiTable
+from memory import Memory
+from random_program import ProgramGenerator
+
+CLOCK_NS = 25
+BENCH_RESULTS = os.environ.get("BENCH_RESULTS", "sim_build/bench_results.json")
+CPI_TABLE = os.environ.get("CPI_TABLE", "sim_build/cpi.txt")
+PAGED_CPI_TABLE = "_paged".join(os.path.splitext(CPI_TABLE))
+
+RESULTS = {}
+# program -> CpiTable.totals()
+CPI = {}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def measure(name, dut, workload):
+    sim_start = get_sim_time("ns")
+    wall_start = time.perf_counter()
+    await workload(dut)
+    wall = time.perf_counter() - wall_start
+    sim_ns = get_sim_time("ns") - sim_start
+    cycles = sim_ns / CLOCK_NS
+    RESULTS[name] = {
+        "cycles": int(cycles),
+        "sim_ns": int(sim_ns),
+        "wall_s": round(wall, 4),
+        "cycles_per_s": round(cycles / wall, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    dut._log.info(f"{name}: {RESULTS[name]}")
+    _save()
+
+
+def _save():
+    os.makedirs(os.path.dirname(BENCH_RESULTS) or ".", exist_ok=True)
+    with open(BENCH_RESULTS, "w") as f:
+        json.dump(
+            {"simulator": cocotb.SIM_NAME, "results": RESULTS, "cpi": CPI},
+            f,
+            indent=2,
+        )
+
+
+async def zpg_loop(dut):
+    # the tightest helper loop there is, back to back ASL ZPG
+    clock = Clock(dut.clk, CLOCK_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    for start in range(64):
+        await helper.reset_cpu(dut)
+        value = start
+        pc = 1
+        for _ in range(64):
+            await helper.test_zpg_instruction(
+                dut, helper.hex_to_num("06"), 0x80, pc, value, (value * 2) % 256
+            )
+            value = (value * 2) % 256
+            pc += 2
+
+
+@cocotb.test()
+async def bench_zpg_loop(dut):
+    await measure("zpg_loop", dut, zpg_loop)
+
+
+@cocotb.test()
+async def bench_add_matrix_fuzz(dut):
+    await measure("add_matrix_fuzz", dut, suite.test_add_matrix_fuzz)
+
+
+@cocotb.test()
+async def bench_multiply_nums_fuzz(dut):
+    await measure("multiply_nums_fuzz", dut, suite.test_multiply_nums_fuzz)
+
+
+@cocotb.test()
+async def bench_multiply_nums_program(dut):
+    # the same workload as above through the memory model and lockstep model
+    await measure("multiply_nums_program", dut, suite.test_multiply_nums_program)
+
+
+async def measure_cpi(dut, memory, start, done):
+    # runs what is loaded into memory from start until it writes done
+    sampler = CpiSampler(dut)
+    await helper.hold_reset(dut)
+    memory.start()
+    sampler.start()
+    if start:
+        await helper.load_state(dut, pc=start)
+    await with_timeout(memory.wait_for_write(done), 20, "ms")
+    memory.stop()
+    sampler.stop()
+    return sampler.table
+
+
+async def cpi_multiply(dut, page_mode):
+    memory = Memory(dut, page_mode=page_mode)
+    program = assemble(suite.MULTIPLY_PROGRAM)
+    program.load(memory)
+    memory[program["a"]] = 123
+    memory[program["b"]] = 45
+    return await measure_cpi(dut, memory, 0, program["result"])
+
+
+async def cpi_add_matrix(dut, page_mode):
+    memory = Memory(dut, page_mode=page_mode)
+    assemble(suite.ADD_MATRIX_PROGRAM).load(memory)
+    memory.load([random.randint(1, 255) for _ in range(512)], 0x500)
+    return await measure_cpi(dut, memory, 0, 0x7FF)
+
+
+async def cpi_random_program(dut, page_mode):
+    # a fixed seed, long enough to run every implemented opcode
+    program = ProgramGenerator(298).generate(2000).layout()
+    memory = Memory(dut, page_mode=page_mode)
+    program.load(memory)
+    return await measure_cpi(dut, memory, program["start"], program["done"])
+
+
+@cocotb.test()
+async def bench_cpi(dut):
+    clock = Clock(dut.clk, CLOCK_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    for page_mode, path in ((False, CPI_TABLE), (True, PAGED_CPI_TABLE)):
+        # the same data for both buses
+        random.seed(0)
+        table = CpiTable()
+        for name, workload in (
+            ("multiply_nums_program", cpi_multiply),
+            ("add_matrix_program", cpi_add_matrix),
+            ("random_program", cpi_random_program),
+        ):
+            if page_mode:
+                name += "_paged"
+            program_table = await workload(dut, page_mode)
+            CPI[name] = program_table.totals()
+            dut._log.info(f"{name}: {CPI[name]}")
+            table.merge(program_table)
+        _save()
+        with open(path, "w") as f:
+            f.write(table.format() + "\n")
+        dut._log.info(f"cycles per instruction, in {path}:\n{table.format()}")
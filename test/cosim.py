@@ -0,0 +1,92 @@
+import cocotb
+from cocotb.triggers import ReadOnly, RisingEdge
+
+from decoder import S_OPCODE_READ
+from model import format_flags
+from opcodes import format_instruction
+
+REGISTERS = (
+    ("A", "accumulator"),
+    ("X", "index_register_x"),
+    ("Y", "index_register_y"),
+    ("PC", "pc"),
+    ("P", "processor_status_register"),
+)
+
+
+def _format(name, value):
+    if name == "P":
+        return format_flags(value)
+    return f"{value:04x}" if name == "PC" else f"{value:02x}"
+
+
+class Lockstep:
+    # Steps a model.Cpu one instruction every time instruction_decode enters
+    # S_OPCODE_READ and compares the architectural registers of tt_um_6502
+    # against it. STATE only moves on the edge that ends a bus cycle, the one
+    # that leaves clk_enable low. A test can switch page mode between resets
+    # while we run, where a bus cycle can be a single clock, so we look at
+    # every clock rather than picking an edge when we start.
+    #
+    # At that point pc holds the address of the opcode being decoded and
+    # every register write of the previous instruction has landed.
+    def __init__(self, dut, cpu):
+        self.dut = dut
+        self.cpu = cpu
+        self.retired = 0
+        # called with the model just before it runs each opcode
+        self.observers = []
+        self._task = None
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    def _dut_state(self):
+        top = self.dut.user_project
+        return tuple(int(getattr(top, signal).value) for _, signal in REGISTERS)
+
+    def report(self, actual, last_pc):
+        cpu = self.cpu
+        expected = cpu.state()
+        if self.retired:
+            last = f"last one {format_instruction(cpu.mem, last_pc)} at {last_pc:04x}"
+        else:
+            last = "before the first instruction"
+        lines = [
+            f"DUT diverged from the model after {self.retired} instructions, {last}"
+        ]
+        for (name, _), dut_value, model_value in zip(REGISTERS, actual, expected):
+            marker = "  <--" if dut_value != model_value else ""
+            lines.append(
+                f"  {name:<2} dut={_format(name, dut_value)}"
+                f" model={_format(name, model_value)}{marker}"
+            )
+        return "\n".join(lines)
+
+    async def _run(self):
+        cpu = self.cpu
+        state = self.dut.user_project.instructionDecode.STATE
+        clk_enable = self.dut.user_project.clk_enable
+        rising_edge = RisingEdge(self.dut.clk)
+        last_pc = cpu.pc
+        while True:
+            await rising_edge
+            await ReadOnly()
+            if clk_enable.value or int(state.value) != S_OPCODE_READ:
+                continue
+            actual = self._dut_state()
+            if actual != cpu.state():
+                message = self.report(actual, last_pc)
+                self.dut._log.error(message)
+                raise AssertionError(message)
+            last_pc = cpu.pc
+            for observer in self.observers:
+                observer(cpu)
+            cpu.step()
+            self.retired += 1
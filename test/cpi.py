@@ -0,0 +1,120 @@
+# Cycles per instruction, measured from the state of instruction_decode.
+#
+# CpiSampler looks at STATE once per bus cycle, like cosim.Lockstep. Every
+# S_OPCODE_READ starts an instruction, its opcode already latched in
+# OPCODE, and the bus cycles until the next S_OPCODE_READ are charged to
+# it. So the tail of a store or a read-modify-write, which overlaps the next
+# opcode fetch on the bus, counts against the instruction it belongs to,
+# unlike disasm.Instruction.cycles. The table is in clocks, two per bus
+# cycle, or one for a read in the latched page in page mode.
+#
+# CpiTable has a row for every opcode in inc/opcode.vh, run or not, with the
+# count, CPI and the fewest and most clocks taken.
+
+import cocotb
+from cocotb.triggers import ReadOnly
+
+from decoder import S_OPCODE_READ
+from memory import bus_cycle_edge
+from opcodes import OPCODES
+
+
+class CpiTable:
+    def __init__(self):
+        # opcode -> [count, clocks, fewest, most]
+        self.rows = {}
+
+    def add(self, opcode, clocks):
+        row = self.rows.get(opcode)
+        if row is None:
+            self.rows[opcode] = [1, clocks, clocks, clocks]
+        else:
+            row[0] += 1
+            row[1] += clocks
+            row[2] = min(row[2], clocks)
+            row[3] = max(row[3], clocks)
+
+    def merge(self, other):
+        for opcode, (count, clocks, fewest, most) in other.rows.items():
+            row = self.rows.setdefault(opcode, [0, 0, fewest, most])
+            row[0] += count
+            row[1] += clocks
+            row[2] = min(row[2], fewest)
+            row[3] = max(row[3], most)
+
+    @property
+    def instructions(self):
+        return sum(row[0] for row in self.rows.values())
+
+    @property
+    def clocks(self):
+        return sum(row[1] for row in self.rows.values())
+
+    @property
+    def cpi(self):
+        return self.clocks / self.instructions if self.instructions else 0.0
+
+    def totals(self):
+        return {
+            "instructions": self.instructions,
+            "clocks": self.clocks,
+            "cpi": round(self.cpi, 3),
+        }
+
+    def format(self):
+        lines = [f"{'':3}{'':4}{'':6}{'count':>8}{'CPI':>8}{'min':>5}{'max':>5}"]
+        for opcode in sorted(set(OPCODES) | set(self.rows)):
+            op = OPCODES.get(opcode)
+            name = f"{op.mnemonic:<4}{op.mode:<6}" if op else f"{'?':<10}"
+            row = self.rows.get(opcode)
+            if row is None:
+                status = "unimplemented" if op and not op.implemented else "not run"
+                lines.append(f"{opcode:02x} {name}{status:>8}")
+                continue
+            count, clocks, fewest, most = row
+            lines.append(
+                f"{opcode:02x} {name}{count:>8}{clocks / count:>8.2f}{fewest:>5}{most:>5}"
+            )
+        lines.append(
+            f"{self.instructions} instructions in {self.clocks} clocks,"
+            f" CPI {self.cpi:.2f}"
+        )
+        return "\n".join(lines)
+
+
+class CpiSampler:
+    # Fills a CpiTable while the core runs. Only instructions that finished,
+    # by reaching the next S_OPCODE_READ, are counted. In page mode start it
+    # after the memory model.
+    def __init__(self, dut, table=None):
+        self.dut = dut
+        self.table = CpiTable() if table is None else table
+        self._task = None
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def _run(self):
+        decoder = self.dut.user_project.instructionDecode
+        state = decoder.STATE
+        opcode_register = decoder.OPCODE
+        clk_enable = self.dut.user_project.clk_enable
+        phase_edge, step = bus_cycle_edge(self.dut)
+        add = self.table.add
+        opcode = None
+        clocks = 0
+        while True:
+            await phase_edge
+            await ReadOnly()
+            if not clk_enable.value and int(state.value) == S_OPCODE_READ:
+                if opcode is not None:
+                    add(opcode, clocks)
+                opcode = int(opcode_register.value)
+                clocks = 0
+            clocks += step
@@ -0,0 +1,18 @@
+import os
+import re
+
+DECODER_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "src", "instruction_decode.v"
+)
+
+
+def parse_states(path=DECODER_FILE):
+    # localparam S_IDLE = 4'd0; ... from instruction_decode.v
+    with open(path) as f:
+        states = re.findall(r"localparam\s+(S_\w+)\s*=\s*\d+'d(\d+)\s*;", f.read())
+    return {name: int(value) for name, value in states}
+
+
+STATES = parse_states()
+STATE_NAMES = {value: name for name, value in STATES.items()}
+S_OPCODE_READ = STATES["S_OPCODE_READ"]
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# Decodes a stream of bus transactions back into the instructions that made
+# them, one transaction per bus cycle as (address, rw, data) or (address,
+# rw, data, cycle). Nothing is kept beyond the last two instructions, so a
+# trace of any length decodes in constant memory.
+#
+#   python disasm.py trace.txt
+#
+# Offline, a trace file has one "cycle address rw data" line per bus cycle
+# in hex, as written by TraceWriter, or it is the spill file of a
+# monitor.BusMonitor. Live, Decoder.attach(callback) gives a hook for
+# BusMonitor.subscribe() or Memory(dut, trace=...).
+#
+# What the decoder relies on, from watching tt_um_6502 on the bus:
+#   - the opcode address stays on the bus while the previous instruction
+#     finishes, so the same read shows up several times in a row
+#   - operands are read from pc+1 (and pc+2) in order, ZPG and ABS then
+#     read their effective address, stores included
+#   - the write of a store or read-modify-write comes while the next
+#     instruction is already being fetched
+# A read repeating the last address is only dropped while it can't be the
+# next fetch. Once the operands are in the next pc is known (both of them
+# for a branch), and the first read there is the next opcode even if it
+# repeats the last address, like a ZPG operand that points at the next
+# instruction or a branch with an offset of 0, which lands on its operand.
+# cycles is the number of bus cycles from one opcode fetch to the next, so
+# the tail of an instruction is counted against the one after it.
+
+import argparse
+import sys
+
+from monitor import read_spill
+from opcodes import OPCODES, format_operands
+
+READ = 1
+WRITE = 0
+
+# mnemonics that write their result back to memory in the ZPG and ABS modes
+WRITES = ("STA", "STX", "STY", "ASL", "LSR", "ROL", "ROR", "INC", "DEC")
+
+
+class Instruction:
+    __slots__ = (
+        "cycle",
+        "pc",
+        "opcode",
+        "operands",
+        "address",
+        "read",
+        "written",
+        "next_pc",
+        "cycles",
+    )
+
+    def __init__(self, cycle, pc, opcode):
+        self.cycle = cycle
+        self.pc = pc
+        self.opcode = opcode
+        self.operands = []
+        # effective address for ZPG/ABS, the target for REL and JMP
+        self.address = None
+        self.read = None
+        self.written = None
+        self.next_pc = None
+        self.cycles = None
+
+    @property
+    def op(self):
+        return OPCODES.get(self.opcode)
+
+    @property
+    def taken(self):
+        # for branches, whether the next opcode came from the target
+        return self.next_pc is not None and self.next_pc == self.address
+
+    def __str__(self):
+        op = self.op
+        raw = " ".join(f"{b:02x}" for b in [self.opcode] + self.operands)
+        text = format_operands(op, self.pc, self.operands) if op else ".byte"
+        line = f"{self.pc:04x}  {raw:<8}  {text:<10}"
+        if op is not None and op.mode == "REL" and self.next_pc is not None:
+            line += "  taken" if self.taken else "  not taken"
+        elif self.read is not None:
+            line += f"  [{self.address:04x}] {self.read:02x}"
+            if self.written is not None:
+                line += f" -> {self.written:02x}"
+        if self.cycles is not None:
+            line += f"  ({self.cycles} cycles)"
+        return line
+
+    def __repr__(self):
+        return f"Instruction({self})"
+
+
+def _next_pcs(instruction):
+    # where the next opcode can come from, once the operands are in
+    op = instruction.op
+    size = op.size if op is not None else 1
+    after = (instruction.pc + size) & 0xFFFF
+    if op is None:
+        return (after,)
+    if op.mnemonic == "JMP":
+        return (instruction.address,)
+    if op.mode == "REL":
+        return (after, instruction.address)
+    return (after,)
+
+
+def _effective_address(instruction):
+    op = instruction.op
+    operands = instruction.operands
+    if op.mode == "ZPG":
+        return operands[0]
+    if op.mode == "ABS":
+        return operands[0] | (operands[1] << 8)
+    if op.mode == "REL":
+        return (instruction.pc + 1 + operands[0]) & 0xFFFF
+    return None
+
+
+class Decoder:
+    # Push side of the decoder, feed() takes one transaction and returns the
+    # instructions it completed. An instruction is only complete once the
+    # one after it has been fetched, since its write can come that late.
+    def __init__(self):
+        self.count = 0
+        self._current = None
+        self._pending = None
+        self._expect = []
+        self._next = ()
+        self._last = None
+
+    def feed(self, address, rw, data, cycle=None):
+        if cycle is None:
+            cycle = self.count
+        self.count += 1
+        if rw == WRITE:
+            self._write(address, data)
+            return []
+        current = self._current
+        if current is not None:
+            if self._expect and address == self._expect[0]:
+                self._expect.pop(0)
+                self._consume(address, data)
+                self._last = address
+                return []
+            if address == self._last and address not in self._next:
+                return []
+        # anything else is the next opcode fetch, which also resyncs the
+        # decoder when a trace starts mid instruction
+        self._last = address
+        return self._fetch(address, data, cycle)
+
+    def finish(self, cycle=None):
+        # the instructions still open at the end of the stream
+        done = []
+        if self._pending is not None:
+            done.append(self._pending)
+        if self._current is not None:
+            if cycle is None:
+                cycle = self.count
+            self._current.cycles = cycle - self._current.cycle
+            done.append(self._current)
+        self._pending = self._current = None
+        self._expect = []
+        self._next = ()
+        return done
+
+    def attach(self, callback):
+        # a Memory(trace=...) or BusMonitor.subscribe() hook that calls back
+        # with every instruction
+        def trace(address, rw, data, cycle=None):
+            for instruction in self.feed(address, rw, data, cycle):
+                callback(instruction)
+
+        return trace
+
+    def _fetch(self, address, data, cycle):
+        done = []
+        if self._pending is not None:
+            done.append(self._pending)
+        current = self._current
+        if current is not None:
+            current.cycles = cycle - current.cycle
+            current.next_pc = address
+        self._pending = current
+        current = self._current = Instruction(cycle, address, data)
+        op = current.op
+        size = op.size if op is not None else 1
+        self._expect = [(address + i) & 0xFFFF for i in range(1, size)]
+        self._next = () if self._expect else _next_pcs(current)
+        return done
+
+    def _consume(self, address, data):
+        current = self._current
+        op = current.op
+        if len(current.operands) < op.size - 1:
+            current.operands.append(data)
+            if len(current.operands) == op.size - 1:
+                current.address = _effective_address(current)
+                if op.mode in ("ZPG", "ABS") and op.mnemonic != "JMP":
+                    self._expect.append(current.address)
+                self._next = _next_pcs(current)
+        else:
+            current.read = data
+
+    def _write(self, address, data):
+        for instruction in (self._pending, self._current):
+            if (
+                instruction is not None
+                and instruction.address == address
+                and instruction.op is not None
+                and instruction.op.mnemonic in WRITES
+            ):
+                instruction.written = data
+                return
+
+
+def decode(transactions):
+    # generator of Instructions from an iterable of transactions
+    decoder = Decoder()
+    for transaction in transactions:
+        yield from decoder.feed(*transaction)
+    yield from decoder.finish()
+
+
+class TraceWriter:
+    # Memory(trace=...) hook that writes a trace file for decode()
+    def __init__(self, path):
+        self.file = open(path, "w")
+        self.count = 0
+
+    def __call__(self, address, rw, data, cycle=None):
+        if cycle is None:
+            cycle = self.count
+        self.file.write(f"{cycle:x} {address:04x} {rw} {data:02x}\n")
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_trace(path):
+    # (address, rw, data, cycle) for every line of a trace file
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            cycle, address, rw, data = (int(field, 16) for field in fields)
+            yield address, rw, data, cycle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="disassemble a bus trace")
+    parser.add_argument(
+        "trace", help="trace file (- for stdin) or a BusMonitor spill file (.bin)"
+    )
+    args = parser.parse_args(argv)
+    path = "/dev/stdin" if args.trace == "-" else args.trace
+    if path.endswith(".bin"):
+        transactions = read_spill(path)
+    else:
+        transactions = read_trace(path)
+    for instruction in decode(transactions):
+        print(f"{instruction.cycle:>10}  {instruction}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# Opt-in profiler for the state machine in instruction_decode.
+#
+#   FSM_PROFILE=sim_build/fsm make TESTCASE=test_add_matrix_program
+#
+# Once per bus cycle, on the edge where STATE can move, FsmSampler counts
+# the STATE the decoder is in and the one it moves to, under the opcode in
+# OPCODE. That is NEXT_STATE as the clocked block latches it, reading the
+# combinational NEXT_STATE itself would catch it before the operand on
+# uio_in has settled. Bus cycles in reset or in a debug load aren't counted.
+#
+# With FSM_PROFILE set, helper.py starts a sampler the first time each test
+# resets the core through hold_reset, and when the simulator exits all of
+# them are written out:
+#
+#   FSM_PROFILE.txt   bus cycles per state, the transitions by count, and per
+#                     opcode the bus cycles an instruction spends in each
+#                     state
+#   FSM_PROFILE.json  the same per opcode, with the 16x16 transition matrix
+#                     over all opcodes
+
+import atexit
+import functools
+import json
+import os
+
+import numpy as np
+
+import cocotb
+from cocotb.triggers import ReadOnly, RisingEdge
+
+from decoder import STATE_NAMES, S_OPCODE_READ
+from opcodes import OPCODES
+
+FSM_PROFILE = os.environ.get("FSM_PROFILE")
+
+# opcode, state, next state
+SHAPE = (256, 16, 16)
+
+
+def _state(state):
+    return STATE_NAMES.get(state, str(state))
+
+
+def _opcode(opcode):
+    op = OPCODES.get(opcode)
+    return f"{opcode:02x} {op.mnemonic} {op.mode}" if op else f"{opcode:02x}"
+
+
+class FsmProfile:
+    def __init__(self):
+        # flat (opcode << 8 | state << 4 | next state) -> bus cycles, a list
+        # since adding to one of its items is the cheapest there is
+        self.counts = [0] * (256 * 16 * 16)
+
+    def transitions(self):
+        return np.array(self.counts, dtype=np.int64).reshape(SHAPE)
+
+    def occupancy(self):
+        # [opcode, state] -> bus cycles
+        return self.transitions().sum(axis=2)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def per_instruction(self, occupancy=None):
+        # opcode -> (instructions, {state: bus cycles per instruction})
+        occupancy = self.occupancy() if occupancy is None else occupancy
+        rows = {}
+        for opcode in np.flatnonzero(occupancy[:, S_OPCODE_READ]):
+            instructions = int(occupancy[opcode, S_OPCODE_READ])
+            rows[int(opcode)] = (
+                instructions,
+                {
+                    _state(state): cycles / instructions
+                    for state, cycles in enumerate(occupancy[opcode].tolist())
+                    if cycles
+                },
+            )
+        return rows
+
+    def to_json(self):
+        transitions = self.transitions()
+        occupancy = transitions.sum(axis=2)
+        opcodes = {}
+        for opcode in np.flatnonzero(occupancy.sum(axis=1)):
+            opcodes[_opcode(opcode)] = {
+                "occupancy": {
+                    _state(state): cycles
+                    for state, cycles in enumerate(occupancy[opcode].tolist())
+                    if cycles
+                },
+                "transitions": {
+                    f"{_state(a)} -> {_state(b)}": int(transitions[opcode, a, b])
+                    for a, b in np.argwhere(transitions[opcode])
+                },
+            }
+        return {
+            "states": {
+                _state(state): cycles
+                for state, cycles in enumerate(occupancy.sum(axis=0).tolist())
+            },
+            "matrix": transitions.sum(axis=0).tolist(),
+            "opcodes": opcodes,
+        }
+
+    def format(self):
+        transitions = self.transitions()
+        occupancy = transitions.sum(axis=2)
+        states = occupancy.sum(axis=0)
+        total = int(states.sum()) or 1
+        lines = [f"bus cycles per state, {int(states.sum())} in all"]
+        for state in np.argsort(-states, kind="stable"):
+            if states[state]:
+                lines.append(
+                    f"  {_state(state):<20}{states[state]:>10}"
+                    f"{states[state] / total:>8.1%}"
+                )
+        matrix = transitions.sum(axis=0)
+        lines.append("transitions")
+        for a, b in sorted(np.argwhere(matrix), key=lambda ab: -matrix[tuple(ab)]):
+            lines.append(
+                f"  {_state(a):<20}-> {_state(b):<20}{matrix[a, b]:>10}"
+                f"{matrix[a, b] / total:>8.1%}"
+            )
+        lines.append("bus cycles per instruction in each state")
+        for opcode, (count, cycles) in sorted(self.per_instruction(occupancy).items()):
+            path = ", ".join(f"{state} {n:g}" for state, n in cycles.items())
+            lines.append(f"  {_opcode(opcode):<14}{count:>8}  {path}")
+        return "\n".join(lines)
+
+    def write(self, prefix):
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        with open(f"{prefix}.txt", "w") as f:
+            f.write(self.format() + "\n")
+        with open(f"{prefix}.json", "w") as f:
+            json.dump(self.to_json(), f, indent=1)
+
+
+class FsmSampler:
+    def __init__(self, dut, profile=None):
+        self.dut = dut
+        self.profile = FsmProfile() if profile is None else profile
+        self._task = None
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def _run(self):
+        decoder = self.dut.user_project.instructionDecode
+        state = decoder.STATE
+        opcode = decoder.OPCODE
+        # low in reset and while the debug port loads a register, which holds
+        # clk_enable low for clocks on end
+        rst_n = self.dut.user_project.core_rst_n
+        clk_enable = self.dut.user_project.clk_enable
+        rising_edge = RisingEdge(self.dut.clk)
+        counts = self.profile.counts
+        last = None
+        while True:
+            # a test can switch page mode between resets while we run, and
+            # with or without it a bus cycle ends on the edge that leaves
+            # clk_enable low, so we look at every clock
+            await rising_edge
+            await ReadOnly()
+            if not int(rst_n.value):
+                last = None
+                continue
+            if clk_enable.value:
+                continue
+            now = int(state.value)
+            if last is not None:
+                counts[last | now] += 1
+            last = (int(opcode.value) << 8) | (now << 4)
+
+
+PROFILE = FsmProfile()
+_sampler = None
+
+
+def install(namespace):
+    # called by helper.py with its globals when FSM_PROFILE is set
+    hold_reset = namespace["hold_reset"]
+
+    @functools.wraps(hold_reset)
+    async def sampled_hold_reset(dut):
+        global _sampler
+        await hold_reset(dut)
+        # cocotb kills every task when a test ends, the sampler of the last
+        # test with them
+        if _sampler is None or _sampler.done():
+            _sampler = FsmSampler(dut, PROFILE).start()
+
+    namespace["hold_reset"] = sampled_hold_reset
+    atexit.register(PROFILE.write, FSM_PROFILE)
@@ -0,0 +1,315 @@
+import random
+
+import numpy as np
+
+import cocotb
+from cocotb.triggers import ReadOnly, RisingEdge
+
+from decoder import STATE_NAMES, STATES
+from model import CARRY_FLAG, NEGATIVE_FLAG, ZERO_FLAG
+from opcodes import IMPLEMENTED
+
+# Functional coverage of the instruction set as one bitmap indexed by
+# [opcode, flag state, operand class], the opcode fixing the addressing mode.
+#
+# The flag state is C, Z and N packed into three bits, but only the flags an
+# opcode actually reads are kept (the carry for ADC/SBC, the tested flag for
+# a branch), so flag states that can't make a difference share a bin. The
+# operand class is the byte the instruction works on: its immediate, the
+# memory value, the register for stores, transfers and increments, or the
+# branch offset.
+#
+# Sampling goes through cosim.Lockstep, which has just checked the core
+# against the model when it calls us, so a bin is only hit by an instruction
+# the DUT really ran with that state.
+
+FLAGS = (CARRY_FLAG, ZERO_FLAG, NEGATIVE_FLAG)
+FLAG_STATES = 1 << len(FLAGS)
+
+CLASSES = ("none", "zero", "one", "low", "7f", "80", "high", "ff")
+NONE = CLASSES.index("none")
+# inclusive value ranges of the classes that have a value
+CLASS_RANGES = {
+    "zero": (0x00, 0x00),
+    "one": (0x01, 0x01),
+    "low": (0x02, 0x7E),
+    "7f": (0x7F, 0x7F),
+    "80": (0x80, 0x80),
+    "high": (0x81, 0xFE),
+    "ff": (0xFF, 0xFF),
+}
+_CLASS_OF = np.zeros(256, dtype=np.uint8)
+for _name, (_low, _high) in CLASS_RANGES.items():
+    _CLASS_OF[_low : _high + 1] = CLASSES.index(_name)
+
+BRANCH_FLAGS = {
+    "BCS": CARRY_FLAG,
+    "BCC": CARRY_FLAG,
+    "BEQ": ZERO_FLAG,
+    "BNE": ZERO_FLAG,
+    "BPL": NEGATIVE_FLAG,
+    "BMI": NEGATIVE_FLAG,
+}
+# implied operand of the IMPL instructions that have one
+REGISTER_OPERANDS = {
+    "INX": "x",
+    "DEX": "x",
+    "TXA": "x",
+    "INY": "y",
+    "DEY": "y",
+    "TYA": "y",
+    "TAX": "a",
+    "TAY": "a",
+}
+STORES = {"STA": "a", "STX": "x", "STY": "y"}
+
+# a taken branch has to land past the fall through trap, see Generator
+MIN_BRANCH_OFFSET = 4
+
+
+def relevant_flags(op):
+    if op.mnemonic in ("ADC", "SBC"):
+        return CARRY_FLAG
+    return BRANCH_FLAGS.get(op.mnemonic, 0)
+
+
+def operand_source(op):
+    # where the operand byte lives: imm, mem, offset, a, x, y or None
+    if op.mnemonic == "JMP":
+        return None
+    if op.mode == "IMM":
+        return "imm"
+    if op.mode == "REL":
+        return "offset"
+    if op.mode == "A":
+        return "a"
+    if op.mode in ("ZPG", "ABS"):
+        return STORES.get(op.mnemonic, "mem")
+    return REGISTER_OPERANDS.get(op.mnemonic)
+
+
+def flag_state(p, mask):
+    state = 0
+    for bit, flag in enumerate(FLAGS):
+        if p & flag & mask:
+            state |= 1 << bit
+    return state
+
+
+def flags_for(state):
+    # the P bits of a packed flag state
+    return sum(flag for bit, flag in enumerate(FLAGS) if state & (1 << bit))
+
+
+def _build_goal():
+    goal = np.zeros((256, FLAG_STATES, len(CLASSES)), dtype=bool)
+    for value, op in IMPLEMENTED.items():
+        mask = relevant_flags(op)
+        states = sorted({flag_state(flags_for(s), mask) for s in range(FLAG_STATES)})
+        source = operand_source(op)
+        if source is None:
+            classes = [NONE]
+        elif source == "offset":
+            classes = [
+                CLASSES.index(name)
+                for name, (_, high) in CLASS_RANGES.items()
+                if high >= MIN_BRANCH_OFFSET
+            ]
+        else:
+            classes = [CLASSES.index(name) for name in CLASS_RANGES]
+        for state in states:
+            goal[value, state, classes] = True
+    return goal
+
+
+GOAL = _build_goal()
+
+
+class Coverage:
+    def __init__(self):
+        self.bins = np.zeros_like(GOAL)
+        self.goal = GOAL
+        self.transitions = np.zeros((16, 16), dtype=bool)
+        self._task = None
+
+    def operand(self, cpu, op):
+        source = operand_source(op)
+        if source is None:
+            return None
+        mem = cpu.mem
+        pc = cpu.pc
+        if source in ("imm", "offset"):
+            return mem[(pc + 1) & 0xFFFF]
+        if source == "mem":
+            address = mem[(pc + 1) & 0xFFFF]
+            if op.mode == "ABS":
+                address |= mem[(pc + 2) & 0xFFFF] << 8
+            return mem[address]
+        return getattr(cpu, source)
+
+    def sample(self, cpu):
+        # Lockstep observer, called with the model about to run an opcode
+        opcode = cpu.mem[cpu.pc]
+        op = IMPLEMENTED.get(opcode)
+        if op is None:
+            return
+        value = self.operand(cpu, op)
+        operand_class = NONE if value is None else _CLASS_OF[value]
+        self.bins[opcode, flag_state(cpu.p, relevant_flags(op)), operand_class] = True
+
+    def start_fsm(self, dut):
+        self._task = cocotb.start_soon(self._watch_fsm(dut))
+        return self._task
+
+    def stop_fsm(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def _watch_fsm(self, dut):
+        # STATE only moves on the edge that ends a bus cycle, the one that
+        # leaves clk_enable low. Page mode can change while we run, so we
+        # look at every clock like Lockstep.
+        state = dut.user_project.instructionDecode.STATE
+        clk_enable = dut.user_project.clk_enable
+        # low in reset and while the debug port loads, which holds clk_enable
+        # low for clocks on end
+        rst_n = dut.user_project.core_rst_n
+        rising_edge = RisingEdge(dut.clk)
+        transitions = self.transitions
+        last = None
+        while True:
+            await rising_edge
+            await ReadOnly()
+            if not int(rst_n.value):
+                last = None
+                continue
+            if clk_enable.value:
+                continue
+            now = int(state.value)
+            if last is not None:
+                transitions[last, now] = True
+            last = now
+
+    def uncovered(self, opcode):
+        # (flag state, operand class) pairs still to hit for opcode
+        return np.argwhere(self.goal[opcode] & ~self.bins[opcode])
+
+    def missing(self):
+        return int((self.goal & ~self.bins).sum())
+
+    def summary(self):
+        hit = self.goal & self.bins
+        modes = {}
+        for value, op in IMPLEMENTED.items():
+            mode = modes.setdefault(op.mode, [0, 0])
+            mode[0] += int(hit[value].sum())
+            mode[1] += int(self.goal[value].sum())
+        visited = self.transitions.any(axis=0) | self.transitions.any(axis=1)
+        return {
+            "bins": int(hit.sum()),
+            "goal": int(self.goal.sum()),
+            "modes": {mode: tuple(counts) for mode, counts in sorted(modes.items())},
+            "states": sorted(STATE_NAMES[s] for s in np.flatnonzero(visited)),
+            "unvisited_states": sorted(
+                name for name, s in STATES.items() if not visited[s]
+            ),
+            "transitions": [
+                (STATE_NAMES.get(a, a), STATE_NAMES.get(b, b))
+                for a, b in np.argwhere(self.transitions)
+            ],
+        }
+
+    def merge(self, other):
+        self.bins |= other.bins
+        self.transitions |= other.transitions
+
+    def save(self, path):
+        # bit packed, and merged with what is already there so runs add up
+        try:
+            self.merge(load(path))
+        except FileNotFoundError:
+            pass
+        np.savez_compressed(
+            path,
+            bins=np.packbits(self.bins),
+            transitions=np.packbits(self.transitions),
+        )
+
+
+def load(path):
+    coverage = Coverage()
+    with np.load(path) as saved:
+        coverage.bins = (
+            np.unpackbits(saved["bins"], count=GOAL.size)
+            .reshape(GOAL.shape)
+            .astype(bool)
+        )
+        coverage.transitions = (
+            np.unpackbits(saved["transitions"], count=256).reshape(16, 16).astype(bool)
+        )
+    return coverage
+
+
+class Vector:
+    __slots__ = ("opcode", "a", "x", "y", "p", "operand")
+
+    def __init__(self, opcode, a, x, y, p, operand):
+        self.opcode = opcode
+        self.a = a
+        self.x = x
+        self.y = y
+        self.p = p
+        self.operand = operand
+
+    def __repr__(self):
+        return (
+            f"Vector({IMPLEMENTED[self.opcode]!r}, a={self.a:02x} x={self.x:02x}"
+            f" y={self.y:02x} p={self.p:02x} operand={self.operand:02x})"
+        )
+
+
+class Generator:
+    # Random single instruction vectors, biased towards what is not covered
+    # yet: the opcode is drawn weighted by its missing bins and then one of
+    # those bins is picked, once everything is covered it is plain random.
+    def __init__(self, coverage, rng=random):
+        self.coverage = coverage
+        self.rng = rng
+        self.opcodes = sorted(IMPLEMENTED)
+
+    def next(self):
+        rng = self.rng
+        coverage = self.coverage
+        missing = [len(coverage.uncovered(opcode)) for opcode in self.opcodes]
+        if any(missing):
+            opcode = rng.choices(self.opcodes, weights=missing)[0]
+            choices = coverage.uncovered(opcode)
+        else:
+            opcode = rng.choice(self.opcodes)
+            choices = np.argwhere(coverage.goal[opcode])
+        state, operand_class = choices[rng.randrange(len(choices))]
+        return self.vector(opcode, int(state), int(operand_class))
+
+    def vector(self, opcode, state, operand_class):
+        rng = self.rng
+        op = IMPLEMENTED[opcode]
+        # the flags that don't matter to this opcode are random
+        mask = relevant_flags(op)
+        p = (rng.randrange(0x80) & ~mask) | flags_for(state)
+        name = CLASSES[operand_class]
+        if name == "none":
+            operand = rng.randrange(256)
+        else:
+            operand = rng.randint(*CLASS_RANGES[name])
+        if operand_source(op) == "offset":
+            operand = max(operand, MIN_BRANCH_OFFSET)
+        a, x, y = (rng.randrange(256) for _ in range(3))
+        source = operand_source(op)
+        if source == "a":
+            a = operand
+        elif source == "x":
+            x = operand
+        elif source == "y":
+            y = operand
+        return Vector(opcode, a, x, y, p, operand)
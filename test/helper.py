@@ -1,4 +1,10 @@
-from cocotb.triggers import ClockCycles
+import os
+
+from cocotb.triggers import ClockCycles, RisingEdge
+
+import fsm_profile
+import waves
+from memory import DEBUG_LOAD_PIN, DEBUG_PORT, PAGE_MODE_PIN
 
 
 def hex_to_num(hex_string):
@@ -23,7 +29,8 @@ def hex_to_num(hex_string):
     return vals[hex_string[0]] * 16 + vals[hex_string[1]]
 
 
-async def reset_cpu(dut):
+async def hold_reset(dut):
+    waves.follow_environment(dut)
     dut.ena.value = 1
     dut.ui_in.value = 0
     dut.uio_in.value = 0
@@ -31,257 +38,282 @@ async def reset_cpu(dut):
     await ClockCycles(dut.clk, 10)
     dut.rst_n.value = 1
 
-    # now we run a nop so that our pc actually increments
-    dut.uio_in.value = hex_to_num("ea")
-    await ClockCycles(dut.clk, 2)
-    dut.uio_in.value = 0
-    await ClockCycles(dut.clk, 2)
-
-
-async def test_zpg_instruction(
-    dut, opcode, addr_LB, starting_PC, input_value, output_value, enable_pc_checks=True
-):
-    # feed in the opcode
-    dut.uio_in.value = opcode
-    assert dut.uo_out.value == (starting_PC) // 256
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == (starting_PC + 1) // 256
-
-    # feed in the addr to read from
-    dut.uio_in.value = addr_LB
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC + 1) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
 
-    assert dut.uo_out.value == 0  # goal HB This is ZPG
+async def reset_cpu(dut):
+    await hold_reset(dut)
 
-    # feed in the data we want to operate on
-    dut.uio_in.value = input_value
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == addr_LB
-    await ClockCycles(dut.clk, 1)
+    # now we run a nop so that our pc actually increments, its decode cycle
+    # already fetches the next opcode from pc 1
+    dut.uio_in.value = hex_to_num("ea")
+    await ClockCycles(dut.clk, 2)
 
-    # wait for the ALU to get the data
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
 
-    # wait for data bus buffer to get the data
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
+async def load_state(dut, a=0, x=0, y=0, p=0, pc=0):
+    # Loads the registers through the debug port on ui_in, one clock each,
+    # instead of running a preamble of instructions. We return with the core
+    # about to fetch its first opcode from pc, the same point every
+    # instruction helper starts from. clk_enable stays low while loading so
+    # the memory model can already be running. The first clock only holds
+    # the core, a running memory model answers the read in flight and would
+    # fight us over uio_in. Page mode stays strapped if it is.
+    strap = int(dut.ui_in.value) & PAGE_MODE_PIN
+    load = DEBUG_LOAD_PIN
+    for select, value in (
+        ("HOLD", 0),
+        ("PCL", pc & 0xFF),
+        ("PCH", pc >> 8),
+        ("A", a),
+        ("X", x),
+        ("Y", y),
+        ("P", p),
+    ):
+        dut.ui_in.value = strap | load | DEBUG_PORT[select]
+        dut.uio_in.value = value
+        await ClockCycles(dut.clk, 1)
+    dut.ui_in.value = strap
+    dut.uio_in.value = 0
     await ClockCycles(dut.clk, 1)
 
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value == output_value  # check the value
-    assert dut.uio_oe.value == hex_to_num("ff")  # check if we are outputting
-    assert dut.uo_out.value == 0  # check the page we are writing to
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value % 2 == 0  # last bit should be 0 for write
-    assert dut.uo_out.value == addr_LB  # check the mem addr we are writing to
-    await ClockCycles(dut.clk, 1)
+# Bus schedule of every addressing mode, one row per clock from the opcode
+# being put on uio_in until the next opcode can go on. A row is the value we
+# drive on uio_in (None keeps the last one) and the checks made on the
+# outputs before that clock. uo_out carries the high address byte and the
+# write data on uio_out in one phase, the low byte and rw in the other.
+#
+# The last state of an instruction that doesn't write already has the next
+# pc on the bus and fetches the next opcode, so each schedule stops before
+# it and the next one's first two rows run in it.
+#
+# Checks are (signal, expected, only_with_pc_checks) where expected names one
+# of the values worked out in bus_values() below.
+READ = 1
+WRITE = 0
+
+TIMING = {
+    "IMPL": (
+        ("opcode", (("uo_out", "pc_hi", False),)),
+        (None, (("uo_out", "pc_lo", True), ("rw", READ, False))),
+    ),
+    "A": (
+        ("opcode", (("uo_out", "pc_hi", False),)),
+        (None, (("uo_out", "pc_lo", True), ("rw", READ, False))),
+        (None, (("uo_out", "pc_hi", False),)),
+        (None, (("uo_out", "pc1_lo", True), ("rw", READ, False))),
+        (None, ()),  # ALU
+        (None, ()),
+    ),
+    "IMM": (
+        ("opcode", (("uo_out", "pc_hi", False),)),
+        (None, (("uo_out", "pc_lo", True), ("rw", READ, False))),
+        ("operand", (("uo_out", "pc1_hi", False),)),
+        (None, (("uo_out", "pc1_lo", True), ("rw", READ, False))),
+        (None, ()),  # input data latch
+        (None, ()),
+        (None, ()),  # ALU
+        (None, ()),
+    ),
+    "REL": (
+        ("opcode", (("uo_out", "pc_hi", False),)),
+        (None, (("uo_out", "pc_lo", True), ("rw", READ, False))),
+        ("operand", (("uo_out", "pc1_hi", False),)),
+        (None, (("uo_out", "pc1_lo", True), ("rw", READ, False))),
+        (None, ()),  # input data latch
+        (None, ()),
+    ),
+    "ZPG": (
+        ("opcode", (("uo_out", "pc_hi", False),)),
+        (None, (("uo_out", "pc_lo", True), ("rw", READ, False))),
+        ("operand", (("uo_out", "pc1_hi", False),)),
+        (None, (("uo_out", "pc1_lo", True), ("rw", READ, False))),
+        ("input", (("uo_out", "addr_hi", False),)),
+        (None, (("uo_out", "addr_lo", False), ("rw", READ, False))),
+        (None, (("uo_out", "pc2_hi", False),)),  # input data latch
+        (None, ()),
+        (None, ()),  # ALU
+        (None, ()),
+    ),
+    "ABS": (
+        ("opcode", (("uo_out", "pc_hi", False),)),
+        (None, (("uo_out", "pc_lo", True), ("rw", READ, False))),
+        ("operand", (("uo_out", "pc1_hi", False),)),
+        (None, (("uo_out", "pc1_lo", True), ("rw", READ, False))),
+        ("operand2", (("uo_out", "pc2_hi", False),)),
+        (None, (("uo_out", "pc2_lo", True), ("rw", READ, False))),
+        ("input", (("uo_out", "addr_hi", False),)),
+        (None, (("uo_out", "addr_lo", False), ("rw", READ, False))),
+        (None, (("uo_out", "pc3_hi", False),)),  # input data latch
+        (None, ()),
+        (None, ()),  # ALU
+        (None, ()),
+    ),
+    "JMP": (
+        ("opcode", (("uo_out", "pc_hi", False),)),
+        (None, (("uo_out", "pc_lo", True), ("rw", READ, False))),
+        ("operand", (("uo_out", "pc1_hi", False),)),
+        (None, (("uo_out", "pc1_lo", True), ("rw", READ, False))),
+        ("operand2", (("uo_out", "pc2_hi", False),)),
+        (None, (("uo_out", "pc2_lo", True), ("rw", READ, False))),
+    ),
+}
+
+# appended to ZPG/ABS when the instruction writes its result back to memory,
+# the next opcode is fetched after the write
+WRITE_BACK = (
+    (None, ()),  # into the data bus buffer
+    (None, ()),
+    (
+        None,
+        (
+            ("uio_out", "result", False),
+            ("uio_oe", "output_enable", False),
+            ("uo_out", "addr_hi", False),
+        ),
+    ),
+    (None, (("rw", WRITE, False), ("uo_out", "addr_lo", False))),
+)
+
+
+def bus_values(opcode, starting_PC, operands, input_value, output_value):
+    operand = operands[0] if operands else 0
+    operand2 = operands[1] if len(operands) > 1 else 0
+    # ZPG has a single operand byte, ABS and JMP give the low byte first
+    address = operand | (operand2 << 8)
+    values = {
+        "opcode": opcode,
+        "operand": operand,
+        "operand2": operand2,
+        "input": input_value,
+        "result": output_value,
+        "output_enable": 0xFF,
+        "addr_hi": address >> 8,
+        "addr_lo": address & 0xFF,
+    }
+    for offset in range(4):
+        pc = (starting_PC + offset) & 0xFFFF
+        suffix = str(offset) if offset else ""
+        values[f"pc{suffix}_hi"] = pc >> 8
+        values[f"pc{suffix}_lo"] = pc & 0xFF
+    return values
+
+
+def _compile(rows):
+    # resolve the check kinds up front so the driver loop only compares
+    compiled = []
+    for drive, checks in rows:
+        compiled.append(
+            (
+                drive,
+                tuple(
+                    (signal, expected, pc_check, isinstance(expected, str))
+                    for signal, expected, pc_check in checks
+                ),
+            )
+        )
+    return tuple(compiled)
+
+
+SCHEDULES = {mode: _compile(rows) for mode, rows in TIMING.items()}
+WRITE_SCHEDULES = {mode: _compile(rows + WRITE_BACK) for mode, rows in TIMING.items()}
+
+
+async def run_instruction(
+    dut,
+    mode,
+    opcode,
+    starting_PC,
+    operands=(),
+    input_value=0,
+    output_value=None,
+    enable_pc_checks=True,
+):
+    # output_value is the byte we expect written back, None for no write
+    values = bus_values(opcode, starting_PC, operands, input_value, output_value)
+    if output_value is None:
+        schedule = SCHEDULES[mode]
+    else:
+        schedule = WRITE_SCHEDULES[mode]
+    rising_edge = RisingEdge(dut.clk)
+    signals = {
+        "uo_out": dut.uo_out,
+        "uio_out": dut.uio_out,
+        "uio_oe": dut.uio_oe,
+        "rw": dut.uio_out,
+    }
+    for row, (drive, checks) in enumerate(schedule):
+        if drive is not None:
+            dut.uio_in.value = values[drive]
+        for signal, expected, pc_check, named in checks:
+            if pc_check and not enable_pc_checks:
+                continue
+            actual = int(signals[signal].value)
+            if signal == "rw":
+                actual &= 1
+            if named:
+                expected = values[expected]
+            assert (
+                actual == expected
+            ), f"{mode} row {row}: {signal} is {actual:#04x}, expected {expected:#04x}"
+        await rising_edge
 
 
-async def test_zpg_instruction_jmp_specifc(
+async def test_zpg_instruction(
     dut, opcode, addr_LB, starting_PC, input_value, output_value, enable_pc_checks=True
 ):
-    # feed in the opcode
-    dut.uio_in.value = opcode
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC % 256)
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == starting_PC // 256
-
-    # feed in the addr to read from
-    dut.uio_in.value = addr_LB
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC + 1) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    # assert dut.uo_out.value == (starting_PC + 1) // 256
-
-    # feed in the data we want to operate on
-    dut.uio_in.value = input_value
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == addr_LB
-    await ClockCycles(dut.clk, 1)
-    # assert dut.uo_out.value == 0  # this shouldn't change though
-
-    # wait for the ALU to get the data
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
-    # wait for data bus buffer to get the data
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
+    await run_instruction(
+        dut,
+        "ZPG",
+        opcode,
+        starting_PC,
+        (addr_LB,),
+        input_value,
+        output_value,
+        enable_pc_checks,
+    )
 
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value == output_value  # check the value
-    assert dut.uio_oe.value == hex_to_num("ff")  # check if we are outputting
-    assert dut.uo_out.value == 0  # check the page we are writing to
 
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value % 2 == 0  # last bit should be 0 for write
-    assert dut.uo_out.value == addr_LB  # check the mem addr we are writing to
-    await ClockCycles(dut.clk, 1)
+# kept for the existing tests, the generic ZPG schedule handles any page now
+test_zpg_instruction_jmp_specifc = test_zpg_instruction
 
 
 async def test_imm_instruction(
     dut, opcode, starting_PC, immediate_value, enable_pc_checks=True
 ):
-    dut.uio_in.value = opcode
-    assert dut.uo_out.value == (starting_PC) // 256
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == (starting_PC + 1) // 256
+    await run_instruction(
+        dut, "IMM", opcode, starting_PC, (immediate_value,), 0, None, enable_pc_checks
+    )
 
-    dut.uio_in.value = immediate_value
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC + 1) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
 
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
+run_input_imm_instruction = test_imm_instruction
 
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
 
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-    
+async def test_impl_instruction(dut, opcode, starting_PC, enable_pc_checks=True):
+    await run_instruction(
+        dut, "IMPL", opcode, starting_PC, enable_pc_checks=enable_pc_checks
+    )
 
-async def test_impl_instruction(
-    dut, opcode, starting_PC, enable_pc_checks=True
-):
-    dut.uio_in.value = opcode
-    assert dut.uo_out.value == (starting_PC)//256
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC)%256 
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == (starting_PC+1)//256
-
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC + 1) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    
-    
-async def run_input_imm_instruction(
-    dut, opcode, starting_PC, immediate_value, enable_pc_checks=True
-):
-    dut.uio_in.value = opcode
-    assert dut.uo_out.value == (starting_PC) // 256
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == (starting_PC + 1) // 256
-
-    dut.uio_in.value = immediate_value
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC + 1) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
 
 async def test_branch_instruction(
     dut, opcode, starting_PC, offset, enable_pc_checks=True
 ):
-    dut.uio_in.value = opcode
-    assert dut.uo_out.value == (starting_PC)//256
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC)%256 
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == (starting_PC+1)//256
-
-    dut.uio_in.value = offset
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC + 1) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
+    await run_instruction(
+        dut, "REL", opcode, starting_PC, (offset,), 0, None, enable_pc_checks
+    )
 
 
 async def run_input_zpg_instruction(
     dut, opcode, addr_LB, starting_PC, input_value, enable_pc_checks=True
 ):
-    # feed in the opcode
-    dut.uio_in.value = opcode
-    assert dut.uo_out.value == (starting_PC) // 256
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == (starting_PC + 1) // 256
-
-    # feed in the addr to read from
-    dut.uio_in.value = addr_LB
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == (starting_PC + 1) % 256
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
-
-    # feed in the data we want to operate on
-    dut.uio_in.value = input_value
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == addr_LB
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0  # this shouldn't change though
-
-    # wait
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
-    # wait
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
+    await run_instruction(
+        dut,
+        "ZPG",
+        opcode,
+        starting_PC,
+        (addr_LB,),
+        input_value,
+        None,
+        enable_pc_checks,
+    )
 
 
 async def test_abs_instruction(
@@ -294,58 +326,16 @@ async def test_abs_instruction(
     output_value,
     enable_pc_checks=True,
 ):
-    # feed in the opcode
-    dut.uio_in.value = opcode
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == starting_PC
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
-
-    # feed in the addr_LB to read from
-    dut.uio_in.value = addr_LB
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == starting_PC + 1
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
-
-    # feed in the addr_HB to read from
-    dut.uio_in.value = addr_HB
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == addr_HB
-
-    # feed in the data we want to operate on
-    dut.uio_in.value = input_value
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == addr_LB
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0  # this shouldn't change though
-
-    # wait for the ALU to get the data
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
-    # wait for data bus buffer to get the data
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value == output_value  # check the value
-    assert dut.uio_oe.value == hex_to_num("ff")  # check if we are outputting
-    assert dut.uo_out.value == addr_HB  # check the page we are writing to
-
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value % 2 == 0  # last bit should be 0 for write
-    assert dut.uo_out.value == addr_LB  # check the mem addr we are writing to
-    await ClockCycles(dut.clk, 1)
+    await run_instruction(
+        dut,
+        "ABS",
+        opcode,
+        starting_PC,
+        (addr_LB, addr_HB),
+        input_value,
+        output_value,
+        enable_pc_checks,
+    )
 
 
 async def run_input_abs_instruction(
@@ -357,49 +347,16 @@ async def run_input_abs_instruction(
     input_value,
     enable_pc_checks=True,
 ):
-    # feed in the opcode
-    dut.uio_in.value = opcode
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == starting_PC
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
-
-    # feed in the addr_LB to read from
-    dut.uio_in.value = addr_LB
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == starting_PC + 1
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
-
-    # feed in the addr_HB to read from
-    dut.uio_in.value = addr_HB
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == addr_HB
-
-    # feed in the data we want to operate on
-    dut.uio_in.value = input_value
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == addr_LB
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0  # this shouldn't change though
-
-    # wait for the ALU to get the data
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-
-    # wait for data bus buffer to get the data
-    dut.uio_in.value = hex_to_num("00")
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
+    await run_instruction(
+        dut,
+        "ABS",
+        opcode,
+        starting_PC,
+        (addr_LB, addr_HB),
+        input_value,
+        None,
+        enable_pc_checks,
+    )
 
 
 async def run_jmp_abs_instruction(
@@ -410,68 +367,34 @@ async def run_jmp_abs_instruction(
     starting_PC,
     enable_pc_checks=True,
 ):
-    # feed in the opcode
-    dut.uio_in.value = opcode
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == starting_PC
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
-
-    # feed in the addr_LB to read from
-    dut.uio_in.value = addr_LB
-    await ClockCycles(dut.clk, 1)
-    if enable_pc_checks:
-        assert dut.uo_out.value == starting_PC + 1
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
-
-    # feed in the addr_HB to read from
-    dut.uio_in.value = addr_HB
-    await ClockCycles(dut.clk, 1)
-    assert dut.uio_out.value % 2 == 1  # last bit should be 1 for read
-    await ClockCycles(dut.clk, 1)
-
-    dut.uio_in.value = 0
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
+    await run_instruction(
+        dut,
+        "JMP",
+        opcode,
+        starting_PC,
+        (addr_LB, addr_HB),
+        0,
+        None,
+        enable_pc_checks,
+    )
 
 
 async def run_incXY_instruction(dut, opcode, starting_PC):
-    # feed in the opcode
-    dut.uio_in.value = opcode
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == starting_PC
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
+    await run_instruction(dut, "A", opcode, starting_PC)
 
-    # wait for the first state
-    dut.uio_in.value = 0
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
 
-    # wait for the second state
-    dut.uio_in.value = 0
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
+async def run_transfer_instruction(dut, opcode, starting_PC):
+    await run_instruction(dut, "IMPL", opcode, starting_PC)
 
-    # wait for the third state
-    dut.uio_in.value = 0
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
 
+# PROFILE=path profiles every coroutine above, see profiling.py. It patches
+# cocotb itself, so without PROFILE it isn't even imported
+if os.environ.get("PROFILE"):
+    import profiling
 
-async def run_transfer_instruction(dut, opcode, starting_PC):
-    # feed in the opcode
-    dut.uio_in.value = opcode
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == starting_PC
-    await ClockCycles(dut.clk, 1)
-    assert dut.uo_out.value == 0
+    profiling.install(globals())
 
-    # wait for the first state
-    dut.uio_in.value = 0
-    await ClockCycles(dut.clk, 1)
-    await ClockCycles(dut.clk, 1)
+# FSM_PROFILE=path counts decoder states and transitions per opcode in every
+# test that resets the core, see fsm_profile.py
+if fsm_profile.FSM_PROFILE:
+    fsm_profile.install(globals())
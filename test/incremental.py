@@ -0,0 +1,157 @@
+# Opt-in result cache for test.py.
+#
+#   make SIM=verilator INCREMENTAL=1
+#
+# Every test gets a key, a sha256 of what its result depends on: the RTL
+# (src/*.v and inc/*.vh), tb.v, every Python module test.py imports from
+# this directory, the source of the test and of the functions, classes and
+# constants in test.py it uses, RANDOM_SEED and the SEED, SEED_ITERATION,
+# SIM and GATES settings. A test that passed with the same key is skipped,
+# everything else runs and the keys of the ones that pass are kept in
+# sim_build/test_cache.json, going by the results file cocotb writes at the
+# end of the run (see results.py). Naming tests with TESTCASE runs them
+# anyway.
+# The Makefile pins RANDOM_SEED to 1 unless one is given, with a new seed
+# every run no key would come up twice.
+#
+# TEST_DEPS=path names a JSON dependency map that narrows what some files feed
+# into, for example
+#
+#   {"inc/alu_ops.vh": ["test_ADC_*", "test_SBC_*", "test_alu_*"]}
+#
+# A file in the map, relative to the top of the repo, only goes into the
+# keys of the tests matching one of its patterns. Files not in the map go
+# into every key.
+
+import fnmatch
+import glob
+import hashlib
+import inspect
+import json
+import os
+import sys
+import types
+
+import cocotb
+
+import results
+
+INCREMENTAL = os.environ.get("INCREMENTAL")
+TEST_DEPS = os.environ.get("TEST_DEPS")
+CACHE = os.path.join("sim_build", "test_cache.json")
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TEST_DIR)
+
+RTL = ("src/*.v", "inc/*.vh", "test/tb.v")
+# settings that change what a test does without changing any file
+SETTINGS = ("SEED", "SEED_ITERATION", "SIM", "GATES")
+
+# test name -> (the cocotb test, its key) for the module installed
+keys = {}
+cache = {}
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def inputs(namespace):
+    # every file a result depends on, relative to ROOT
+    paths = set()
+    for pattern in RTL:
+        paths.update(glob.glob(os.path.join(ROOT, pattern)))
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.dirname(os.path.abspath(path)) == TEST_DIR:
+            paths.add(os.path.abspath(path))
+    paths.discard(os.path.abspath(namespace["__file__"]))
+    return sorted(os.path.relpath(path, ROOT) for path in paths)
+
+
+def _names(code):
+    # the global names a code object and the ones nested in it use
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _names(const)
+    return names
+
+
+def uses(func, namespace, seen=None):
+    # the source of func and of what it uses from namespace, recursively
+    seen = set() if seen is None else seen
+    parts = [inspect.getsource(func)]
+    for name in sorted(_names(func.__code__)):
+        if name in seen or name not in namespace:
+            continue
+        seen.add(name)
+        value = namespace[name]
+        if isinstance(value, cocotb.test):
+            value = value._func
+        local = getattr(value, "__module__", None) == namespace["__name__"]
+        if inspect.isfunction(value) and local:
+            parts += uses(value, namespace, seen)
+        elif inspect.isclass(value) and local:
+            parts.append(inspect.getsource(value))
+        elif isinstance(value, (bool, int, float, str, tuple)):
+            parts.append(f"{name} = {value!r}")
+    return parts
+
+
+def load_deps(path):
+    if path is None:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def key(name, func, namespace, files, deps):
+    digest = hashlib.sha256()
+    for path, file_digest in files.items():
+        patterns = deps.get(path)
+        if patterns is None or any(fnmatch.fnmatch(name, p) for p in patterns):
+            digest.update(f"{path} {file_digest}\n".encode())
+    for part in uses(func, namespace):
+        digest.update(part.encode())
+    digest.update(f"RANDOM_SEED={cocotb.RANDOM_SEED}\n".encode())
+    for setting in SETTINGS:
+        digest.update(f"{setting}={os.environ.get(setting)}\n".encode())
+    return digest.hexdigest()
+
+
+def install(namespace):
+    # skips the tests in namespace whose key passed last time
+    global cache
+    files = {path: _digest(os.path.join(ROOT, path)) for path in inputs(namespace)}
+    deps = load_deps(TEST_DEPS)
+    if os.path.exists(CACHE):
+        with open(CACHE) as f:
+            cache = json.load(f)
+    for name, test in namespace.items():
+        if not isinstance(test, cocotb.test):
+            continue
+        test_key = key(name, test._func, namespace, files, deps)
+        keys[name] = (test, test_key)
+        if cache.get(name) == test_key:
+            test.skip = True
+    results.on_results(_record)
+
+
+def _save():
+    os.makedirs(os.path.dirname(CACHE), exist_ok=True)
+    with open(CACHE, "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+
+
+def _record(outcomes):
+    # skipped tests aren't in outcomes and keep their entry
+    for name, passed in outcomes.items():
+        if name not in keys:
+            continue
+        if passed:
+            cache[name] = keys[name][1]
+        else:
+            cache.pop(name, None)
+    _save()
@@ -0,0 +1,164 @@
+import os
+import re
+
+import cocotb
+from cocotb.triggers import Event, FallingEdge, RisingEdge
+
+PAGE_MODE_FILE = os.path.join(os.path.dirname(__file__), "..", "inc", "page_mode.vh")
+DEBUG_FILE = os.path.join(os.path.dirname(__file__), "..", "inc", "debug.vh")
+
+
+def parse_debug_port(path=DEBUG_FILE):
+    # DEBUG_LOAD is the ui_in bit, the rest are the register selects
+    with open(path) as f:
+        defines = re.findall(r"`define\s+DEBUG_(\w+)\s+(?:3'd)?(\d+)", f.read())
+    return {name: int(value) for name, value in defines if name != "PORT"}
+
+
+def parse_page_mode(path=PAGE_MODE_FILE):
+    # PAGE_MODE is the ui_in bit, PAGE_STROBE the uio_out one
+    with open(path) as f:
+        defines = re.findall(r"`define\s+PAGE_(\w+)\s+(\d+)", f.read())
+    return {name: int(value) for name, value in defines if name != "PORT"}
+
+
+PAGE_MODE = parse_page_mode()
+PAGE_MODE_PIN = 1 << PAGE_MODE["MODE"]
+PAGE_STROBE = 1 << PAGE_MODE["STROBE"]
+DEBUG_PORT = parse_debug_port()
+DEBUG_LOAD_PIN = 1 << DEBUG_PORT["LOAD"]
+
+
+def page_mode(dut):
+    return bool(int(dut.ui_in.value) & PAGE_MODE_PIN)
+
+
+def bus_cycle_edge(dut):
+    # The trigger for looking at the core once per bus cycle, and the clocks
+    # each wake up stands for. STATE and the registers move on the edge that
+    # ends a bus cycle, where clk_enable falls. In page mode a bus cycle can
+    # be a single clock that leaves clk_enable low, so we wake on every clock
+    # and the ones that leave clk_enable high are halfway through a cycle.
+    if page_mode(dut):
+        return RisingEdge(dut.clk), 1
+    return FallingEdge(dut.user_project.clk_enable), 2
+
+
+class BusPhase:
+    # Which half of a bus cycle the core is in, going by the top level pins
+    # alone, as a gate level netlist has nothing else to look at. step() is
+    # called once every clock, at a point where rst_n and ui_in hold what the
+    # core sees on the rising edge ending it, and returns whether this clock
+    # has ab[7:0] on uo_out and completes a transaction.
+    #
+    # Without page mode that is clk_enable: reset sets it (right away, the
+    # reset is asynchronous), a debug load clears it, and otherwise it flips
+    # every clock. A page hit leaves it clear, so with ui_in[PAGE_MODE]
+    # strapped we are the external latch of inc/page_mode.vh instead: the
+    # high byte comes with the strobe, or for a write in the first of the
+    # two clocks with all of uio_oe set, and every other clock has the low
+    # byte. Start it in reset or in the clock right after it.
+    def __init__(self, dut):
+        self.dut = dut
+        self._low = True
+        self._after_high = False
+
+    def step(self):
+        dut = self.dut
+        if not int(dut.rst_n.value):
+            self._low = True
+            self._after_high = False
+            return True
+        ui_in = int(dut.ui_in.value)
+        if ui_in & PAGE_MODE_PIN:
+            if int(dut.uio_oe.value) & ~PAGE_STROBE:
+                high = not self._after_high
+            else:
+                high = bool(int(dut.uio_out.value) & PAGE_STROBE)
+            self._after_high = high
+            return not high
+        low = self._low
+        self._low = not low and not ui_in & DEBUG_LOAD_PIN
+        return low
+
+
+class Memory:
+    # 64 KiB memory that answers the multiplexed bus of tt_um_6502 by itself.
+    #
+    # The core puts ab[15:8] on uo_out while clk_enable is 0 (with the write
+    # data on uio_out) and ab[7:0] while clk_enable is 1 (with rw on
+    # uio_out[0]). We sample in the middle of every phase, on the falling edge,
+    # so uio_in is already valid for the rising edge that follows, and tell
+    # the phases apart with a BusPhase.
+    #
+    # With page_mode, start() straps ui_in[PAGE_MODE] and we are the external
+    # latch of inc/page_mode.vh. The strobe is the only pin the core drives
+    # during a read, and only in a clock where it doesn't read uio_in.
+    def __init__(self, dut, image=b"", base=0, trace=None, page_mode=False):
+        self.dut = dut
+        self.page_mode = page_mode
+        # called with (address, rw, data) for every bus cycle, see disasm.py
+        self.trace = trace
+        self.data = bytearray(0x10000)
+        self.load(image, base)
+        self.reads = 0
+        self.writes = 0
+        self._watches = {}
+        self._task = None
+
+    def load(self, image, base=0):
+        self.data[base : base + len(image)] = bytes(image)
+
+    def __getitem__(self, address):
+        return self.data[address]
+
+    def __setitem__(self, address, value):
+        self.data[address] = value
+
+    def start(self):
+        if self.page_mode:
+            # right away, so samplers started after us see it
+            self.dut.ui_in.setimmediatevalue(int(self.dut.ui_in.value) | PAGE_MODE_PIN)
+        self._task = cocotb.start_soon(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def wait_for_write(self, address):
+        event = self._watches.get(address)
+        if event is None:
+            event = self._watches[address] = Event()
+        await event.wait()
+
+    async def _run(self):
+        dut = self.dut
+        data = self.data
+        watches = self._watches
+        phase = BusPhase(dut)
+        falling_edge = FallingEdge(dut.clk)
+        trace = self.trace
+        high_byte = 0
+        write_value = 0
+        while True:
+            await falling_edge
+            if not phase.step():
+                high_byte = int(dut.uo_out.value)
+                write_value = int(dut.uio_out.value)
+                continue
+            # a read in the latched page comes with rw like a low clock
+            address = (high_byte << 8) | int(dut.uo_out.value)
+            if int(dut.uio_out.value) & 1:
+                dut.uio_in.value = data[address]
+                self.reads += 1
+                if trace is not None:
+                    trace(address, 1, data[address])
+            else:
+                data[address] = write_value
+                self.writes += 1
+                if trace is not None:
+                    trace(address, 0, write_value)
+                if address in watches:
+                    watches.pop(address).set()
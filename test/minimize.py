@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# Shrinks a failing random program to a small reproducer.
+#
+#   python minimize.py sim_build/random_program_1234.json -j 8 SIM=verilator
+#
+# test_random_programs leaves the program of a failing iteration behind in
+# sim_build. Every candidate is simulated on its own through reproduce.py,
+# a few at a time in parallel, and kept when it fails the same way as the
+# original: the last exception in its log, with the numbers taken out, is
+# the same. Candidates the model can't run to the trap are dropped without
+# simulating them.
+#
+# The program is cut in chunks, halving down to single lines, then the
+# operands are simplified the same way (immediates and addresses to the
+# start of their area, branches and JMPs to the next line, self modifying
+# stores back to plain stores), then the initial data is zeroed. The result
+# goes next to the input as .min.json and as .min.s for assembler.py.
+# Anything of the form NAME=value is passed on to make.
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import random_program
+from random_program import ABS_DATA, ZPG_DATA
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = os.path.join("sim_build", "minimize")
+
+# instructions the model may take to reach the trap, as in run_random_program
+LIMIT = 100000
+
+_ERROR = re.compile(r"^\s*(\w+(?:Error|Exception)): (.*)$")
+_NUMBER = re.compile(r"\$?\b[0-9a-f]+\b|\d+")
+
+
+def signature(log):
+    # the last exception in a simulator log, or None
+    found = None
+    with open(log) as f:
+        for line in f:
+            match = _ERROR.match(line)
+            if match:
+                found = match
+    if found is None:
+        return None
+    kind, message = found.groups()
+    return f"{kind}: {_NUMBER.sub('#', message)}"
+
+
+def failed(results):
+    if not os.path.exists(results):
+        return True
+    try:
+        root = ET.parse(results).getroot()
+    except ET.ParseError:
+        return True
+    return any(case.find("failure") is not None for case in root.iter("testcase"))
+
+
+class Runner:
+    # Simulates candidates through make MODULE=reproduce, one work file per
+    # slot so parallel runs don't trip over each other
+    def __init__(self, make_args, jobs, timeout):
+        self.make_args = make_args
+        self.jobs = jobs
+        self.timeout = timeout
+        self.runs = 0
+        os.makedirs(os.path.join(TEST_DIR, WORK_DIR), exist_ok=True)
+
+    def build(self):
+        subprocess.check_call(
+            ["make", "--no-print-directory", "build"] + self.make_args, cwd=TEST_DIR
+        )
+
+    def run(self, program, slot=0):
+        # the failure signature, None when the program passes
+        base = os.path.join(WORK_DIR, f"candidate_{slot}")
+        results = base + ".xml"
+        log = os.path.join(TEST_DIR, base + ".log")
+        program.save(os.path.join(TEST_DIR, base + ".json"))
+        if os.path.exists(os.path.join(TEST_DIR, results)):
+            os.remove(os.path.join(TEST_DIR, results))
+        command = [
+            "make",
+            "--no-print-directory",
+            "MODULE=reproduce",
+            f"REPRODUCER={base}.json",
+            f"COCOTB_RESULTS_FILE={results}",
+        ] + self.make_args
+        self.runs += 1
+        with open(log, "w") as f:
+            try:
+                subprocess.call(
+                    command,
+                    cwd=TEST_DIR,
+                    stdout=f,
+                    stderr=subprocess.STDOUT,
+                    timeout=self.timeout,
+                )
+            except subprocess.TimeoutExpired:
+                return "timeout"
+        if not failed(os.path.join(TEST_DIR, results)):
+            return None
+        return signature(log) or "failed"
+
+    def first(self, candidates, wanted):
+        # index of the first candidate that fails with wanted, running them
+        # jobs at a time and stopping after the batch that finds one
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for start in range(0, len(candidates), self.jobs):
+                batch = candidates[start : start + self.jobs]
+                outcomes = list(pool.map(self.run, batch, range(len(batch))))
+                for offset, outcome in enumerate(outcomes):
+                    if outcome == wanted:
+                        return start + offset
+        return None
+
+
+def runs_to_trap(program):
+    try:
+        layout = program.layout()
+        cpu = program.run(LIMIT)
+    except ValueError:
+        return False
+    return cpu.pc == layout["trap"]
+
+
+def _is_jump(line):
+    return line.op.mode == "REL" or line.op.mnemonic == "JMP"
+
+
+def remove_lines(program, indices):
+    drop = set(indices)
+    lines = program.lines
+    kept = [i for i in range(len(lines)) if i not in drop]
+    new_index = {old: new for new, old in enumerate(kept)}
+    # where a jump to each old line lands, the next line still there
+    landing = [0] * (len(lines) + 1)
+    landing[len(lines)] = len(kept)
+    for old in range(len(lines) - 1, -1, -1):
+        landing[old] = new_index.get(old, landing[old + 1])
+    candidate = program.copy()
+    candidate.lines = []
+    for old in kept:
+        line = lines[old].copy()
+        if line.target is not None:
+            if _is_jump(line):
+                line.target = landing[line.target]
+            else:
+                line.target = new_index.get(line.target)
+        candidate.lines.append(line)
+    return candidate
+
+
+def removable_lines(program):
+    # everything but the epilogue
+    return list(range(len(program.lines) - 2))
+
+
+def _simple(line, index):
+    # the line with its plainest operand
+    op = line.op
+    simple = line.copy()
+    if _is_jump(line):
+        simple.target = index + 1
+    elif line.target is not None:
+        simple.target = None
+    elif op.mode == "IMM":
+        simple.operand = 0
+    elif op.mode == "ZPG":
+        simple.operand = ZPG_DATA[0]
+    elif op.mode == "ABS":
+        simple.operand = ABS_DATA[0]
+    return simple
+
+
+def simplify_operands(program, indices):
+    candidate = program.copy()
+    for index in indices:
+        candidate.lines[index] = _simple(candidate.lines[index], index)
+    return candidate
+
+
+def simplifiable_operands(program):
+    indices = []
+    for index, line in enumerate(program.lines):
+        if line.fixed:
+            continue
+        simple = _simple(line, index)
+        if (simple.operand, simple.target) != (line.operand, line.target):
+            indices.append(index)
+    return indices
+
+
+def clear_data(program, positions):
+    candidate = program.copy()
+    zpg = len(candidate.zpg)
+    for position in positions:
+        if position < zpg:
+            candidate.zpg[position] = 0
+        else:
+            candidate.absolute[position - zpg] = 0
+    return candidate
+
+
+def nonzero_data(program):
+    return [i for i, b in enumerate(program.zpg + program.absolute) if b]
+
+
+# (name, what can still change, how to change a chunk of it)
+PASSES = (
+    ("lines", removable_lines, remove_lines),
+    ("operands", simplifiable_operands, simplify_operands),
+    ("data", nonzero_data, clear_data),
+)
+
+
+def reduce(runner, program, wanted, items, change, log=print):
+    # tries change() on chunks of items(program), halving the chunks down to
+    # one item, and keeps every candidate that still fails with wanted
+    size = max(1, len(items(program)) // 2)
+    while True:
+        current = items(program)
+        chunks = [current[i : i + size] for i in range(0, len(current), size)]
+        candidates = [change(program, chunk) for chunk in chunks]
+        candidates = [c for c in candidates if runs_to_trap(c)]
+        index = runner.first(candidates, wanted) if candidates else None
+        if index is not None:
+            program = candidates[index]
+            log(
+                f"    chunks of {size}: {len(program.lines)} lines,"
+                f" {len(nonzero_data(program))} data bytes"
+            )
+            continue
+        if size == 1:
+            return program
+        size //= 2
+
+
+def minimize(runner, program, log=print):
+    wanted = runner.run(program)
+    if wanted is None:
+        raise ValueError("the program passes, nothing to minimize")
+    log(f"failure: {wanted}")
+    for name, items, change in PASSES:
+        log(f"  {name}")
+        program = reduce(runner, program, wanted, items, change, log)
+    return program, wanted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="shrink a failing random program")
+    parser.add_argument("program", help="saved RandomProgram (.json)")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="parallel simulations"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=600, help="seconds per simulation"
+    )
+    parser.add_argument(
+        "make_args", nargs="*", metavar="NAME=value", help="passed on to make"
+    )
+    args = parser.parse_intermixed_args(argv)
+
+    program = random_program.load(args.program)
+    runner = Runner(args.make_args, max(1, args.jobs), args.timeout)
+    runner.build()
+    start = time.monotonic()
+    before = len(program.lines)
+    try:
+        program, wanted = minimize(runner, program)
+    except ValueError as e:
+        print(e)
+        return 1
+
+    base = os.path.splitext(args.program)[0]
+    program.save(base + ".min.json")
+    with open(base + ".min.s", "w") as f:
+        f.write(program.source())
+    print(
+        f"{before} -> {len(program.lines)} lines in {runner.runs} simulations,"
+        f" {time.monotonic() - start:.0f}s, {base}.min.json and {base}.min.s"
+    )
+    code = program.source().split(f".org ${random_program.CODE:04x}\n", 1)[1]
+    print(code, end="")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+from opcodes import IMPLEMENTED, OPCODES
+
+# bit positions from inc/status_register.vh
+CARRY_FLAG = 1 << 0
+ZERO_FLAG = 1 << 1
+OVERFLOW_FLAG = 1 << 5
+NEGATIVE_FLAG = 1 << 6
+
+FLAG_NAMES = "NVBDIZC"
+
+_NZ_MASK = ~(ZERO_FLAG | NEGATIVE_FLAG) & 0x7F
+_CNZ_MASK = ~(CARRY_FLAG | ZERO_FLAG | NEGATIVE_FLAG) & 0x7F
+_NZ = [
+    (ZERO_FLAG if v == 0 else 0) | (NEGATIVE_FLAG if v & 0x80 else 0)
+    for v in range(256)
+]
+
+
+class Cpu:
+    # Instruction level reference for the subset in inc/opcode.vh. It follows
+    # what the RTL does rather than a stock 6502 where the two differ:
+    #   - ADC/SBC only update Z and N, the carry is read but never written
+    #   - SBC computes M - A - C, CMP/CPX/CPY set C when reg >= M
+    #   - ROL/ROR rotate the 8 bits without going through the carry
+    #   - TAX/TAY/TXA/TYA leave the flags alone
+    #   - a taken branch lands on opcode address + 1 + offset, the offset is
+    #     zero extended so branches only go forwards
+    __slots__ = ("a", "x", "y", "pc", "p", "mem", "instructions")
+
+    def __init__(self, image=b"", base=0, pc=0):
+        self.mem = bytearray(0x10000)
+        self.mem[base : base + len(image)] = bytes(image)
+        self.reset(pc)
+
+    def reset(self, pc=0):
+        self.a = 0
+        self.x = 0
+        self.y = 0
+        self.p = 0
+        self.pc = pc
+        self.instructions = 0
+
+    def state(self):
+        return (self.a, self.x, self.y, self.pc, self.p)
+
+    def step(self):
+        opcode = self.mem[self.pc]
+        _HANDLERS[opcode](self)
+        self.instructions += 1
+        return opcode
+
+    def run(self, count, until_pc=None):
+        # runs up to count instructions, stopping early once pc == until_pc
+        handlers = _HANDLERS
+        mem = self.mem
+        done = 0
+        while done < count and self.pc != until_pc:
+            handlers[mem[self.pc]](self)
+            done += 1
+        self.instructions += done
+        return done
+
+
+def format_flags(p):
+    # upper case for a set flag, N is bit 6 and C is bit 0
+    return "".join(
+        name if p & (0x40 >> i) else name.lower() for i, name in enumerate(FLAG_NAMES)
+    )
+
+
+# operand fetch, one flavour per addressing mode, each advances pc
+
+
+def _imm_value(cpu):
+    pc = cpu.pc
+    cpu.pc = (pc + 2) & 0xFFFF
+    return cpu.mem[(pc + 1) & 0xFFFF]
+
+
+def _zpg_address(cpu):
+    pc = cpu.pc
+    cpu.pc = (pc + 2) & 0xFFFF
+    return cpu.mem[(pc + 1) & 0xFFFF]
+
+
+def _abs_address(cpu):
+    pc = cpu.pc
+    mem = cpu.mem
+    cpu.pc = (pc + 3) & 0xFFFF
+    return mem[(pc + 1) & 0xFFFF] | (mem[(pc + 2) & 0xFFFF] << 8)
+
+
+_ADDRESS = {"ZPG": _zpg_address, "ABS": _abs_address}
+
+
+def _reader(mode):
+    if mode == "IMM":
+        return _imm_value
+    address = _ADDRESS[mode]
+    return lambda cpu: cpu.mem[address(cpu)]
+
+
+# read-modify-write ALU ops, returning (value, C/Z/N flags)
+
+
+def _asl(v):
+    r = (v << 1) & 0xFF
+    return r, _NZ[r] | (v >> 7)
+
+
+def _lsr(v):
+    r = v >> 1
+    return r, _NZ[r] | (v & 1)
+
+
+def _rol(v):
+    r = ((v << 1) | (v >> 7)) & 0xFF
+    return r, _NZ[r] | (v >> 7)
+
+
+def _ror(v):
+    r = (v >> 1) | ((v & 1) << 7)
+    return r, _NZ[r] | (v & 1)
+
+
+def _inc(v):
+    r = (v + 1) & 0xFF
+    return r, _NZ[r]
+
+
+def _dec(v):
+    r = (v - 1) & 0xFF
+    return r, _NZ[r]
+
+
+_SHIFTS = {"ASL": _asl, "LSR": _lsr, "ROL": _rol, "ROR": _ror}
+_READ_MODIFY_WRITE = dict(_SHIFTS, INC=_inc, DEC=_dec)
+
+
+def _logic(a, m, p, mnemonic):
+    if mnemonic == "AND":
+        r = a & m
+    elif mnemonic == "ORA":
+        r = a | m
+    else:
+        r = a ^ m
+    return r, (p & _NZ_MASK) | _NZ[r]
+
+
+def _adc(a, m, p):
+    total = m + a + (p & CARRY_FLAG)
+    r = total & 0xFF
+    # the ALU tests the full 9 bit sum for zero
+    return r, (p & _NZ_MASK) | (ZERO_FLAG if total == 0 else 0) | (r & 0x80) >> 1
+
+
+def _sbc(a, m, p):
+    total = m - a - (p & CARRY_FLAG)
+    r = total & 0xFF
+    return r, (p & _NZ_MASK) | (ZERO_FLAG if total == 0 else 0) | (r & 0x80) >> 1
+
+
+def _compare(reg, m, p):
+    return (p & _CNZ_MASK) | _NZ[(reg - m) & 0xFF] | (CARRY_FLAG if reg >= m else 0)
+
+
+_BRANCH_CONDITIONS = {
+    "BCS": (CARRY_FLAG, CARRY_FLAG),
+    "BCC": (CARRY_FLAG, 0),
+    "BEQ": (ZERO_FLAG, ZERO_FLAG),
+    "BNE": (ZERO_FLAG, 0),
+    "BMI": (NEGATIVE_FLAG, NEGATIVE_FLAG),
+    "BPL": (NEGATIVE_FLAG, 0),
+}
+
+
+def _build(op):
+    mnemonic, mode = op.mnemonic, op.mode
+    flag_mask = _CNZ_MASK if mnemonic in _SHIFTS else _NZ_MASK
+
+    if mnemonic in ("LDA", "LDX", "LDY"):
+        read = _reader(mode)
+        register = mnemonic[2].lower()
+
+        def handler(cpu):
+            v = read(cpu)
+            setattr(cpu, register, v)
+            cpu.p = (cpu.p & _NZ_MASK) | _NZ[v]
+
+    elif mnemonic in ("STA", "STX", "STY"):
+        address = _ADDRESS[mode]
+        register = mnemonic[2].lower()
+
+        def handler(cpu):
+            cpu.mem[address(cpu)] = getattr(cpu, register)
+
+    elif mnemonic in _READ_MODIFY_WRITE:
+        alu = _READ_MODIFY_WRITE[mnemonic]
+        if mode == "A":
+
+            def handler(cpu):
+                cpu.a, flags = alu(cpu.a)
+                cpu.p = (cpu.p & flag_mask) | flags
+                cpu.pc = (cpu.pc + 1) & 0xFFFF
+
+        else:
+            address = _ADDRESS[mode]
+
+            def handler(cpu):
+                ea = address(cpu)
+                cpu.mem[ea], flags = alu(cpu.mem[ea])
+                cpu.p = (cpu.p & flag_mask) | flags
+
+    elif mnemonic in ("INX", "INY", "DEX", "DEY"):
+        register = mnemonic[2].lower()
+        alu = _inc if mnemonic[0] == "I" else _dec
+
+        def handler(cpu):
+            v, flags = alu(getattr(cpu, register))
+            setattr(cpu, register, v)
+            cpu.p = (cpu.p & _NZ_MASK) | flags
+            cpu.pc = (cpu.pc + 1) & 0xFFFF
+
+    elif mnemonic in ("AND", "ORA", "EOR"):
+        read = _reader(mode)
+
+        def handler(cpu):
+            m = read(cpu)
+            cpu.a, cpu.p = _logic(cpu.a, m, cpu.p, mnemonic)
+
+    elif mnemonic in ("ADC", "SBC"):
+        read = _reader(mode)
+        alu = _adc if mnemonic == "ADC" else _sbc
+
+        def handler(cpu):
+            m = read(cpu)
+            cpu.a, cpu.p = alu(cpu.a, m, cpu.p)
+
+    elif mnemonic in ("CMP", "CPX", "CPY"):
+        read = _reader(mode)
+        register = "a" if mnemonic == "CMP" else mnemonic[2].lower()
+
+        def handler(cpu):
+            m = read(cpu)
+            cpu.p = _compare(getattr(cpu, register), m, cpu.p)
+
+    elif mnemonic in ("TAX", "TAY", "TXA", "TYA"):
+        source, target = mnemonic[1].lower(), mnemonic[2].lower()
+
+        def handler(cpu):
+            setattr(cpu, target, getattr(cpu, source))
+            cpu.pc = (cpu.pc + 1) & 0xFFFF
+
+    elif mnemonic in ("SEC", "CLC", "CLV"):
+        flag = OVERFLOW_FLAG if mnemonic == "CLV" else CARRY_FLAG
+        value = flag if mnemonic == "SEC" else 0
+
+        def handler(cpu):
+            cpu.p = (cpu.p & ~flag) | value
+            cpu.pc = (cpu.pc + 1) & 0xFFFF
+
+    elif mode == "REL":
+        flag, want = _BRANCH_CONDITIONS[mnemonic]
+
+        def handler(cpu):
+            pc = cpu.pc
+            if cpu.p & flag == want:
+                cpu.pc = (pc + 1 + cpu.mem[(pc + 1) & 0xFFFF]) & 0xFFFF
+            else:
+                cpu.pc = (pc + 2) & 0xFFFF
+
+    elif mnemonic == "JMP":
+
+        def handler(cpu):
+            cpu.pc = _abs_address(cpu)
+
+    elif mnemonic == "NOP":
+
+        def handler(cpu):
+            cpu.pc = (cpu.pc + 1) & 0xFFFF
+
+    else:
+        raise ValueError(f"no model for {op!r}")
+
+    return handler
+
+
+def _unimplemented(cpu):
+    opcode = cpu.mem[cpu.pc]
+    name = OPCODES[opcode].name if opcode in OPCODES else "unknown opcode"
+    raise ValueError(f"{name} ({opcode:02x}) at {cpu.pc:04x} is not implemented")
+
+
+_HANDLERS = [_unimplemented] * 256
+for _value, _op in IMPLEMENTED.items():
+    _HANDLERS[_value] = _build(_op)
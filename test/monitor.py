@@ -0,0 +1,148 @@
+import numpy as np
+
+import cocotb
+from cocotb.triggers import RisingEdge
+
+from memory import BusPhase
+
+# one bus cycle, as kept in the ring buffer and in spill files
+TRANSACTION = np.dtype(
+    [("cycle", "<u8"), ("address", "<u2"), ("rw", "u1"), ("data", "u1")]
+)
+
+
+class RingBuffer:
+    # Fixed size buffer of TRANSACTION records that keeps the newest ones.
+    # With a spill path every full buffer is appended to that file before it
+    # gets overwritten, so the file and the buffer together hold the lot.
+    def __init__(self, capacity=1 << 16, spill=None):
+        self.records = np.zeros(capacity, dtype=TRANSACTION)
+        self.capacity = capacity
+        self.total = 0
+        self.spilled = 0
+        self.spill = spill
+        self._file = open(spill, "wb") if spill else None
+
+    def append(self, cycle, address, rw, data):
+        index = self.total % self.capacity
+        self.records[index] = (cycle, address, rw, data)
+        self.total += 1
+        if self._file is not None and index == self.capacity - 1:
+            self.records.tofile(self._file)
+            self.spilled = self.total
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def latest(self, count=None):
+        # the newest count records (default all held), oldest first
+        held = len(self)
+        count = held if count is None else min(count, held)
+        end = self.total % self.capacity
+        indices = (np.arange(end - count, end)) % self.capacity
+        return self.records[indices]
+
+    def unspilled(self):
+        # what is in the buffer but not in the spill file yet
+        return self.latest(self.total - self.spilled)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self):
+        # (address, rw, data, cycle) for everything still reachable, the
+        # spill file first, ready for disasm.decode()
+        if self.spill:
+            if self._file is not None:
+                self._file.flush()
+            yield from read_spill(self.spill)
+            records = self.unspilled()
+        else:
+            records = self.latest()
+        yield from _tuples(records)
+
+
+def _tuples(records):
+    for cycle, address, rw, data in records.tolist():
+        yield address, rw, data, cycle
+
+
+def read_spill(path, chunk=1 << 16):
+    # streams a spill file in chunks, (address, rw, data, cycle) per record
+    with open(path, "rb") as f:
+        while True:
+            records = np.fromfile(f, dtype=TRANSACTION, count=chunk)
+            if not len(records):
+                return
+            yield from _tuples(records)
+
+
+class BusMonitor:
+    # Passive decoder for the multiplexed bus of tt_um_6502, whoever drives
+    # uio_in (the memory model or a test through helper.py).
+    #
+    # Everything is sampled on the rising edge, so we see what the core
+    # latches. While clk_enable is 0 uo_out carries ab[15:8] and uio_out the
+    # write data, while it is 1 uo_out carries ab[7:0] and uio_out[0] rw, and
+    # that phase completes the transaction. A read's data is uio_in.
+    #
+    # With ui_in[PAGE_MODE] strapped (looked at every clock, a test can
+    # switch it between resets) a clock with clk_enable 0 can also be a page
+    # hit, a read with ab[7:0] on uo_out that completes on its own. Like
+    # Memory we go by the pins alone, through a BusPhase, so gate level runs
+    # can use us too. Start us in reset or in the clock right after it.
+    #
+    # Transactions go into a RingBuffer and to every subscriber as
+    # callback(address, rw, data, cycle), cycle counting bus cycles from
+    # start().
+    def __init__(self, dut, capacity=1 << 16, spill=None):
+        self.dut = dut
+        self.buffer = RingBuffer(capacity, spill)
+        self.subscribers = []
+        self.cycle = 0
+        self._task = None
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+        self.buffer.close()
+
+    def __iter__(self):
+        return iter(self.buffer)
+
+    async def _run(self):
+        dut = self.dut
+        uo_out = dut.uo_out
+        uio_out = dut.uio_out
+        uio_in = dut.uio_in
+        phase = BusPhase(dut)
+        rising_edge = RisingEdge(dut.clk)
+        append = self.buffer.append
+        subscribers = self.subscribers
+        high_byte = 0
+        write_value = 0
+        while True:
+            await rising_edge
+            if phase.step():
+                address = (high_byte << 8) | int(uo_out.value)
+                rw = int(uio_out.value) & 1
+                data = int(uio_in.value) if rw else write_value
+                cycle = self.cycle
+                self.cycle += 1
+                append(cycle, address, rw, data)
+                for callback in subscribers:
+                    callback(address, rw, data, cycle)
+            else:
+                high_byte = int(uo_out.value)
+                write_value = int(uio_out.value)
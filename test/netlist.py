@@ -0,0 +1,63 @@
+# The tests of test.py again, each with a hash of every bus transaction it
+# saw, for run_netlist.py to compare the RTL and the Yosys netlist:
+#
+#   make MODULE=netlist BUS_HASHES=sim_build/netlist/rtl.json
+#
+# The tests keep their names, so with the same RANDOM_SEED they draw the
+# same values as under MODULE=test. BUS_HASHES gets
+# {test: {"transactions": n, "sha256": hex}} for the tests that ran.
+
+import atexit
+import functools
+import hashlib
+import json
+import os
+
+import cocotb
+
+import test as suite
+from monitor import BusMonitor
+
+BUS_HASHES = os.environ.get("BUS_HASHES", os.path.join("sim_build", "bus.json"))
+
+# test -> (its BusMonitor, the hash so far), written out when the simulator
+# exits since a test that fails in a forked task is killed without running
+# any finally
+running = {}
+
+
+@atexit.register
+def _save():
+    # a run that never got to a test leaves the last hashes alone
+    if not running:
+        return
+    hashes = {
+        name: {"transactions": monitor.cycle, "sha256": digest.hexdigest()}
+        for name, (monitor, digest) in running.items()
+    }
+    os.makedirs(os.path.dirname(BUS_HASHES) or ".", exist_ok=True)
+    with open(BUS_HASHES, "w") as f:
+        json.dump(hashes, f, indent=1)
+
+
+def hashed(test):
+    @functools.wraps(test._func)
+    async def run(dut):
+        digest = hashlib.sha256()
+        monitor = BusMonitor(dut, capacity=1)
+
+        @monitor.subscribe
+        def add(address, rw, data, cycle):
+            digest.update(bytes((address >> 8, address & 0xFF, rw, data)))
+
+        running[test._func.__name__] = (monitor, digest)
+        monitor.start()
+        await test._func(dut)
+        monitor.stop()
+
+    return cocotb.test(skip=test.skip)(run)
+
+
+for _name, _test in list(vars(suite).items()):
+    if isinstance(_test, cocotb.test):
+        globals()[_name] = hashed(_test)
@@ -0,0 +1,99 @@
+import os
+import re
+
+OPCODE_FILE = os.path.join(os.path.dirname(__file__), "..", "inc", "opcode.vh")
+
+# bytes taken by each addressing mode, opcode included
+SIZES = {"IMPL": 1, "A": 1, "IMM": 2, "ZPG": 2, "ZPG_X": 2, "REL": 2, "ABS": 3}
+
+BRANCHES = ("BCS", "BCC", "BPL", "BMI", "BEQ", "BNE")
+
+# defined in opcode.vh but not handled by instruction_decode yet
+UNIMPLEMENTED_MODES = ("ZPG_X",)
+UNIMPLEMENTED_MNEMONICS = ("JSR",)
+
+_DEFINE = re.compile(r"`define\s+OP_(\w+)\s+8'([hb])([0-9a-fA-F_]+)\b")
+
+
+class Opcode:
+    __slots__ = ("value", "mnemonic", "mode", "size", "name")
+
+    def __init__(self, value, mnemonic, mode, name):
+        self.value = value
+        self.mnemonic = mnemonic
+        self.mode = mode
+        self.size = SIZES[mode]
+        self.name = name
+
+    @property
+    def implemented(self):
+        return (
+            self.mode not in UNIMPLEMENTED_MODES
+            and self.mnemonic not in UNIMPLEMENTED_MNEMONICS
+        )
+
+    def __repr__(self):
+        return f"Opcode({self.value:02x}, {self.mnemonic} {self.mode})"
+
+
+def _split_name(name):
+    # OP_LD_X_ZPG -> LDX ZPG, OP_ASL_A -> ASL A, OP_INX -> INX IMPL
+    if name[:3] in ("LD_", "ST_"):
+        mnemonic = name[:2] + name[3]
+        mode = name[5:]
+    else:
+        mnemonic, _, mode = name.partition("_")
+    if not mode:
+        # JSR takes an absolute address like JMP ABS
+        if mnemonic in BRANCHES:
+            mode = "REL"
+        elif mnemonic == "JSR":
+            mode = "ABS"
+        else:
+            mode = "IMPL"
+    return mnemonic, mode
+
+
+def parse_opcodes(path=OPCODE_FILE):
+    opcodes = {}
+    with open(path) as f:
+        for match in _DEFINE.finditer(f.read()):
+            name, base, digits = match.groups()
+            # the x-don't-care patterns never match, skip the decoder masks too
+            if name.startswith("ALU_"):
+                continue
+            value = int(digits.replace("_", ""), 16 if base == "h" else 2)
+            mnemonic, mode = _split_name(name)
+            opcodes[value] = Opcode(value, mnemonic, mode, "OP_" + name)
+    return opcodes
+
+
+OPCODES = parse_opcodes()
+IMPLEMENTED = {value: op for value, op in OPCODES.items() if op.implemented}
+BY_NAME = {(op.mnemonic, op.mode): op for op in OPCODES.values()}
+
+
+def format_operands(op, pc, operands):
+    # assembler syntax for op at pc, operands are the bytes that follow it
+    low = operands[0] if operands else 0
+    if op.mode == "IMM":
+        return f"{op.mnemonic} #${low:02x}"
+    if op.mode in ("ZPG", "ZPG_X"):
+        suffix = ",X" if op.mode == "ZPG_X" else ""
+        return f"{op.mnemonic} ${low:02x}{suffix}"
+    if op.mode == "ABS":
+        high = operands[1] if len(operands) > 1 else 0
+        return f"{op.mnemonic} ${high:02x}{low:02x}"
+    if op.mode == "REL":
+        return f"{op.mnemonic} ${(pc + 1 + low) & 0xFFFF:04x}"
+    if op.mode == "A":
+        return f"{op.mnemonic} A"
+    return op.mnemonic
+
+
+def format_instruction(mem, pc):
+    op = OPCODES.get(mem[pc])
+    if op is None:
+        return f".byte ${mem[pc]:02x}"
+    operands = [mem[(pc + i) & 0xFFFF] for i in range(1, op.size)]
+    return format_operands(op, pc, operands)
@@ -0,0 +1,196 @@
+# Opt-in profiler for the helper.py drivers.
+#
+#   PROFILE=sim_build/profile make TESTCASE=test_add_matrix_fuzz
+#
+# Every coroutine in helper.py gets wrapped so that it pushes a frame onto a
+# stack kept per cocotb task. Every trigger await and every signal .value
+# read or write is then charged to the frame on top of that stack, and to
+# the running test. When the simulator exits two files are written:
+#
+#   PROFILE.folded  collapsed stacks, test;helper;...;[RisingEdge] and the
+#                   self time in microseconds, for flamegraph.pl, inferno or
+#                   speedscope
+#   PROFILE.json    per test and per helper, the calls, the wall time
+#                   (inclusive of nested helpers), trigger awaits by type and
+#                   signal reads and writes
+#
+# Times are wall clock, so the time spent suspended on a trigger is the
+# simulator and every other task running until that trigger fires. Trigger
+# waits outside a helper are only counted, otherwise the clock task alone
+# would be the whole flamegraph.
+#
+# To see every await and signal access this reaches into cocotb: it
+# replaces __await__ of the triggers and the value property of the handles
+# for the whole run, and reads RegressionManager._test and
+# Scheduler._current_task. Those are private to cocotb and written against
+# the 1.9 series pinned in requirements.txt, they are gone in 2.0. helper.py
+# only imports this module with PROFILE set, so nothing is patched
+# otherwise.
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import time
+from collections import defaultdict
+
+import cocotb
+from cocotb import handle, triggers
+
+PROFILE = os.environ.get("PROFILE")
+
+NO_TEST = "<no test>"
+NO_HELPER = "<outside helpers>"
+
+
+def _counters():
+    return {
+        "calls": 0,
+        "wall_s": 0.0,
+        "triggers": defaultdict(int),
+        "reads": 0,
+        "writes": 0,
+    }
+
+
+class Profiler:
+    def __init__(self):
+        self.test = None
+        # task -> [[helper name, start, time spent in children], ...]
+        self.stacks = {}
+        # collapsed stack -> self time in seconds
+        self.folded = defaultdict(float)
+        # test -> helper -> counters, NO_HELPER for anything outside helpers
+        self.tests = defaultdict(lambda: defaultdict(_counters))
+        self.wrapped = {}
+
+    def _current_test(self):
+        manager = cocotb.regression_manager
+        test = getattr(manager, "_test", None) if manager is not None else None
+        return test.__qualname__ if test is not None else NO_TEST
+
+    def _stack(self):
+        # a new test means the tasks of the last one were all killed
+        test = self._current_test()
+        if test != self.test:
+            self.test = test
+            self.stacks = {}
+        scheduler = cocotb.scheduler
+        task = scheduler._current_task if scheduler is not None else None
+        return self.stacks.setdefault(task, [])
+
+    def _counters(self, stack):
+        return self.tests[self.test][stack[-1][0] if stack else NO_HELPER]
+
+    def wrap(self, func):
+        # aliases in helper.py share one wrapper
+        if func in self.wrapped:
+            return self.wrapped[func]
+
+        @functools.wraps(func)
+        async def profiled(*args, **kwargs):
+            stack = self._stack()
+            stack.append([func.__name__, time.perf_counter(), 0.0])
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                name, start, children = stack.pop()
+                wall = time.perf_counter() - start
+                path = [self.test] + [frame[0] for frame in stack] + [name]
+                self.folded[";".join(path)] += wall - children
+                if stack:
+                    stack[-1][2] += wall
+                counters = self.tests[self.test][name]
+                counters["calls"] += 1
+                counters["wall_s"] += wall
+
+        self.wrapped[func] = profiled
+        return profiled
+
+    def _patch_trigger(self, cls):
+        original = cls.__await__
+        profiler = self
+
+        def __await__(trigger):
+            stack = profiler._stack()
+            kind = type(trigger).__name__
+            profiler._counters(stack)["triggers"][kind] += 1
+            start = time.perf_counter()
+            try:
+                return (yield from original(trigger))
+            finally:
+                if stack:
+                    waited = time.perf_counter() - start
+                    path = [profiler.test] + [frame[0] for frame in stack]
+                    profiler.folded[";".join(path + [f"[{kind}]"])] += waited
+                    stack[-1][2] += waited
+
+        cls.__await__ = __await__
+
+    def _patch_value(self, cls):
+        # subclasses redefine the getter, so each class has its own property
+        prop = vars(cls)["value"]
+        profiler = self
+
+        def read(signal):
+            profiler._counters(profiler._stack())["reads"] += 1
+            return prop.fget(signal)
+
+        def write(signal, value):
+            profiler._counters(profiler._stack())["writes"] += 1
+            prop.fset(signal, value)
+
+        cls.value = property(read, write if prop.fset else None, doc=prop.__doc__)
+
+    def install(self, namespace):
+        for name, value in list(namespace.items()):
+            if inspect.iscoroutinefunction(value):
+                namespace[name] = self.wrap(value)
+        for value in list(vars(triggers).values()):
+            if (
+                isinstance(value, type)
+                and issubclass(value, triggers.Trigger)
+                and "__await__" in vars(value)
+            ):
+                self._patch_trigger(value)
+        for value in list(vars(handle).values()):
+            if isinstance(value, type) and isinstance(
+                vars(value).get("value"), property
+            ):
+                self._patch_value(value)
+        atexit.register(self.write, PROFILE)
+
+    def summary(self):
+        summary = {}
+        for test, helpers in self.tests.items():
+            totals = _counters()
+            for counters in helpers.values():
+                totals["reads"] += counters["reads"]
+                totals["writes"] += counters["writes"]
+                for kind, count in counters["triggers"].items():
+                    totals["triggers"][kind] += count
+            del totals["calls"], totals["wall_s"]
+            for counters in helpers.values():
+                counters["wall_s"] = round(counters["wall_s"], 6)
+            summary[test] = dict(totals, helpers=helpers)
+        return summary
+
+    def write(self, prefix):
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        with open(f"{prefix}.folded", "w") as f:
+            for path, seconds in sorted(self.folded.items()):
+                microseconds = round(seconds * 1e6)
+                if microseconds > 0:
+                    f.write(f"{path} {microseconds}\n")
+        with open(f"{prefix}.json", "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+PROFILER = Profiler()
+
+
+def install(namespace):
+    # called by helper.py with its globals when PROFILE is set, patching the
+    # names there means helpers calling each other are profiled as well
+    PROFILER.install(namespace)
@@ -0,0 +1,367 @@
+import bisect
+import json
+import random
+
+from assembler import Program
+from model import Cpu
+from opcodes import BY_NAME, IMPLEMENTED, OPCODES, format_operands
+
+# Constrained random programs over everything in inc/opcode.vh that
+# instruction_decode implements, laid out as
+#
+#   $0000-$00df   zero page data
+#   $00e0-$00e7   loop counters, one per nesting level
+#   $00ff         done, written once by the epilogue
+#   $0200-$03ff   absolute data
+#   $0400-        code, then "sta done" and "trap: jmp trap"
+#
+# Every program terminates. Branches only go forwards in this core, JMPs
+# are made to go forwards too, and the only backward jump is the one
+# closing a loop:
+#
+#   init:   ldx #count     (or lda/ldy)
+#           stx counter
+#   top:    ...body...     control flow stays inside the body
+#           dec counter
+#           beq exit
+#           jmp top
+#   exit:
+#
+# Nothing in a body can write a counter, random stores and read-modify-
+# writes only go to the data areas. With self modifying code on, an ABS
+# store can instead aim at the operand of an immediate or of a ZPG read
+# somewhere in the code, which changes the value or where it is read from
+# but never the control flow.
+
+ZPG_DATA = (0x00, 0xDF)
+COUNTERS = 0xE0
+MAX_DEPTH = 8
+DONE = 0xFF
+ABS_DATA = (0x0200, 0x03FF)
+CODE = 0x0400
+
+BRANCH_SPAN = 255
+
+READS = ("LDA", "LDX", "LDY", "AND", "ORA", "EOR", "ADC", "SBC", "CMP", "CPX", "CPY")
+STORES = ("STA", "STX", "STY")
+_STORE_FOR = {"LDA": "STA", "LDX": "STX", "LDY": "STY"}
+
+
+class Line:
+    # One instruction. operand is the immediate or the address, target is
+    # the index of the line a branch or JMP goes to, or whose operand a self
+    # modifying store writes. fixed lines belong to the loop scaffolding.
+    __slots__ = ("opcode", "operand", "target", "fixed")
+
+    def __init__(self, opcode, operand=0, target=None, fixed=False):
+        self.opcode = opcode
+        self.operand = operand
+        self.target = target
+        self.fixed = fixed
+
+    @property
+    def op(self):
+        return OPCODES[self.opcode]
+
+    def copy(self):
+        return Line(self.opcode, self.operand, self.target, self.fixed)
+
+    def __repr__(self):
+        return (
+            f"Line({self.op.mnemonic} {self.op.mode} {self.operand:#x}, {self.target})"
+        )
+
+
+class RandomProgram:
+    # The instructions plus the initial data, as lines so they can still be
+    # edited (see the minimizer) before layout() turns them into bytes.
+    # lines[-2:] is the epilogue, which is what the top level jumps to.
+    def __init__(self, lines, zpg, absolute, seed=None):
+        self.lines = lines
+        self.zpg = zpg
+        self.absolute = absolute
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.lines)
+
+    def addresses(self):
+        addresses = []
+        pc = CODE
+        for line in self.lines:
+            addresses.append(pc)
+            pc += OPCODES[line.opcode].size
+        if pc > 0x10000:
+            raise ValueError(f"{len(self.lines)} instructions don't fit in memory")
+        return addresses
+
+    def layout(self):
+        # an assembler.Program from $0000, data and code together
+        addresses = self.addresses()
+        image = bytearray(CODE)
+        image[ZPG_DATA[0] : ZPG_DATA[0] + len(self.zpg)] = self.zpg
+        image[ABS_DATA[0] : ABS_DATA[0] + len(self.absolute)] = self.absolute
+        for line, pc in zip(self.lines, addresses):
+            image += bytes(_encode(line, pc, addresses))
+        symbols = {"start": CODE, "done": DONE, "trap": addresses[-1]}
+        return Program(0, image, symbols)
+
+    def source(self):
+        # the same program for assembler.py, with a label on every target
+        addresses = self.addresses()
+        targets = {line.target for line in self.lines if line.target is not None}
+        out = [f"done = ${DONE:02x}", "        .org $0000"]
+        out += _bytes(self.zpg)
+        out.append(f"        .org ${ABS_DATA[0]:04x}")
+        out += _bytes(self.absolute)
+        out.append(f"        .org ${CODE:04x}")
+        labels = {index: f"L{index}" for index in targets}
+        labels[len(self.lines) - 1] = "trap"
+        for index, (line, pc) in enumerate(zip(self.lines, addresses)):
+            label = labels[index] + ":" if index in labels else ""
+            out.append(f"{label:<8}{_format(line, pc, addresses, labels)}")
+        return "\n".join(out) + "\n"
+
+    def run(self, limit=None):
+        # a model.Cpu that ran the program to the trap
+        program = self.layout()
+        cpu = Cpu(program.image, pc=CODE)
+        if limit is None:
+            limit = 1 << 62
+        cpu.run(limit, until_pc=program["trap"])
+        return cpu
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "seed": self.seed,
+                    "lines": [
+                        [line.opcode, line.operand, line.target, line.fixed]
+                        for line in self.lines
+                    ],
+                    "zpg": self.zpg.hex(),
+                    "absolute": self.absolute.hex(),
+                },
+                f,
+            )
+
+    def copy(self):
+        return RandomProgram(
+            [line.copy() for line in self.lines],
+            bytearray(self.zpg),
+            bytearray(self.absolute),
+            self.seed,
+        )
+
+
+def load(path):
+    with open(path) as f:
+        saved = json.load(f)
+    return RandomProgram(
+        [Line(*fields) for fields in saved["lines"]],
+        bytearray.fromhex(saved["zpg"]),
+        bytearray.fromhex(saved["absolute"]),
+        saved["seed"],
+    )
+
+
+def _encode(line, pc, addresses):
+    op = OPCODES[line.opcode]
+    if line.target is None:
+        operand = line.operand
+    elif op.mode == "REL":
+        operand = addresses[line.target] - pc - 1
+        if not 0 <= operand <= BRANCH_SPAN:
+            raise ValueError(f"branch at {pc:04x} can't reach line {line.target}")
+        return line.opcode, operand
+    elif op.mnemonic == "JMP":
+        operand = addresses[line.target]
+    else:
+        operand = addresses[line.target] + 1
+    if op.size == 3:
+        return line.opcode, operand & 0xFF, operand >> 8
+    if op.size == 2:
+        return line.opcode, operand
+    return (line.opcode,)
+
+
+def _format(line, pc, addresses, labels):
+    op = OPCODES[line.opcode]
+    if line.target is None:
+        return format_operands(op, pc, list(_encode(line, pc, addresses)[1:]))
+    label = labels[line.target]
+    if op.mnemonic == "JMP" or op.mode == "REL":
+        return f"{op.mnemonic} {label}"
+    return f"{op.mnemonic} {label} + 1"
+
+
+def _bytes(data, width=16):
+    return [
+        "        .byte " + ", ".join(f"${b:02x}" for b in data[i : i + width])
+        for i in range(0, len(data), width)
+    ]
+
+
+class ProgramGenerator:
+    # Seeded source of RandomPrograms.
+    #
+    # weights scale how often an opcode is drawn and are keyed by mnemonic
+    # ("ADC"), addressing mode ("ABS") or both ("ADC ABS"), every key that
+    # matches multiplies in. loops is the chance of opening a loop at each
+    # instruction, up to depth levels deep and count iterations each. span
+    # is how many lines ahead a branch or JMP may land. self_modifying is
+    # the chance that an ABS store writes into the code.
+    def __init__(
+        self,
+        seed=None,
+        weights=None,
+        loops=0.02,
+        depth=2,
+        count=(1, 4),
+        span=16,
+        self_modifying=0.0,
+    ):
+        if depth > MAX_DEPTH:
+            raise ValueError(f"loops nest at most {MAX_DEPTH} deep")
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.loops = loops
+        self.depth = depth
+        self.count = count
+        self.span = span
+        self.self_modifying = self_modifying
+        self.opcodes = []
+        self.cum_weights = []
+        total = 0
+        for value, op in sorted(IMPLEMENTED.items()):
+            weight = 1.0
+            for key in (op.mnemonic, op.mode, f"{op.mnemonic} {op.mode}"):
+                weight *= (weights or {}).get(key, 1.0)
+            if weight > 0:
+                total += weight
+                self.opcodes.append(value)
+                self.cum_weights.append(total)
+        if not self.opcodes:
+            raise ValueError("every opcode has a weight of 0")
+        self._jmp = BY_NAME["JMP", "ABS"].value
+        self._dec = BY_NAME["DEC", "ZPG"].value
+        self._beq = BY_NAME["BEQ", "REL"].value
+
+    def generate(self, length):
+        # a program of about length random instructions plus scaffolding
+        rng = self.rng
+        draws = iter(rng.choices(self.opcodes, cum_weights=self.cum_weights, k=length))
+        lines = []
+        # the loop body every line is in, 0 for the top level, and for each
+        # body the last line its control flow may go to
+        regions = []
+        ends = [None]
+        self._block(lines, regions, ends, draws, length, 0)
+        ends[0] = len(lines)
+        lines.append(Line(BY_NAME["STA", "ZPG"].value, DONE, fixed=True))
+        lines.append(Line(self._jmp, target=len(lines), fixed=True))
+        regions += [0, 0]
+        zpg = bytearray(rng.randbytes(ZPG_DATA[1] - ZPG_DATA[0] + 1))
+        absolute = bytearray(rng.randbytes(ABS_DATA[1] - ABS_DATA[0] + 1))
+        program = RandomProgram(lines, zpg, absolute, self.seed)
+        self._resolve(program, regions, ends)
+        return program
+
+    def _block(self, lines, regions, ends, draws, length, depth):
+        # emits up to length random lines, some of them in loops, and returns
+        # how many it used
+        rng = self.rng
+        region = len(ends) - 1
+        used = 0
+        for opcode in draws:
+            used += 1
+            if depth < self.depth and rng.random() < self.loops:
+                used += self._loop(lines, regions, ends, draws, length - used, depth)
+            self._line(lines, opcode)
+            regions.append(region)
+            if used >= length:
+                break
+        return used
+
+    def _loop(self, lines, regions, ends, draws, length, depth):
+        # a jump in the enclosing body may land on the load of the count,
+        # everything after it is a region of its own
+        rng = self.rng
+        counter = COUNTERS + depth
+        load = rng.choice(("LDA", "LDX", "LDY"))
+        lines.append(
+            Line(BY_NAME[load, "IMM"].value, rng.randint(*self.count), None, True)
+        )
+        lines.append(Line(BY_NAME[_STORE_FOR[load], "ZPG"].value, counter, None, True))
+        region = len(ends)
+        regions += [region - 1, region]
+        ends.append(None)
+        top = len(lines)
+        body = max(1, min(length, rng.randint(1, 2 * self.span)))
+        used = self._block(lines, regions, ends, draws, body, depth + 1)
+        # the body's control flow may go as far as the dec
+        tail = ends[region] = len(lines)
+        lines.append(Line(self._dec, counter, fixed=True))
+        lines.append(Line(self._beq, target=tail + 3, fixed=True))
+        lines.append(Line(self._jmp, target=top, fixed=True))
+        regions += [region] * 3
+        return used
+
+    def _line(self, lines, opcode):
+        rng = self.rng
+        op = IMPLEMENTED[opcode]
+        if op.mode == "IMM":
+            operand = rng.randrange(256)
+        elif op.mode == "ZPG":
+            operand = rng.randint(*ZPG_DATA)
+        elif op.mode == "ABS":
+            operand = rng.randint(*ABS_DATA)
+        else:
+            operand = 0
+        lines.append(Line(opcode, operand))
+
+    def _resolve(self, program, regions, ends):
+        # picks the targets once every address is known
+        rng = self.rng
+        lines = program.lines
+        addresses = program.addresses()
+        members = [[] for _ in ends]
+        for index, region in enumerate(regions):
+            members[region].append(index)
+        writable = [
+            index
+            for index, line in enumerate(lines)
+            if not line.fixed
+            and (
+                line.op.mode == "IMM"
+                or line.op.mode == "ZPG"
+                and line.op.mnemonic in READS
+            )
+        ]
+        for index, line in enumerate(lines):
+            op = OPCODES[line.opcode]
+            if line.fixed:
+                continue
+            if op.mode == "REL" or op.mnemonic == "JMP":
+                # a later line of the same body, the next one is always there
+                region = regions[index]
+                same = members[region]
+                first = bisect.bisect_right(same, index)
+                last = bisect.bisect_right(same, ends[region], first)
+                choices = same[first : min(last, first + self.span)]
+                if op.mode == "REL":
+                    reach = addresses[index] + 1 + BRANCH_SPAN
+                    while addresses[choices[-1]] > reach:
+                        choices.pop()
+                line.target = choices[rng.randrange(len(choices))]
+            elif (
+                op.mnemonic in STORES
+                and op.mode == "ABS"
+                and writable
+                and rng.random() < self.self_modifying
+            ):
+                # not the next line, its operand is read before the store lands
+                target = writable[rng.randrange(len(writable))]
+                if target != index + 1:
+                    line.target = target
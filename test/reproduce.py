@@ -0,0 +1,20 @@
+# Runs one saved random_program.RandomProgram, for minimize.py rather than
+# directly:
+#
+#   make MODULE=reproduce REPRODUCER=sim_build/random_program_1234.json
+
+import os
+
+import cocotb
+from cocotb.clock import Clock
+
+import random_program
+import test as suite
+
+
+@cocotb.test()
+async def test_reproducer(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+    program = random_program.load(os.environ["REPRODUCER"])
+    await suite.run_random_program(dut, program)
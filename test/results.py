@@ -0,0 +1,55 @@
+# Test results for the modules that act on them (seeds.py, incremental.py),
+# read back from the results file cocotb writes at the end of a run rather
+# than hooked out of its regression manager, whose insides change between
+# cocotb releases.
+#
+# cocotb writes COCOTB_RESULTS_FILE (results.xml by default) once every test
+# has run, before the simulator exits, so the callbacks registered here are
+# called from atexit with {test name: passed} for the tests of this run that
+# weren't skipped. A file older than this run means the run never finished,
+# and no callback is called.
+
+import atexit
+import os
+import time
+import xml.etree.ElementTree as ET
+
+RESULTS_FILE = os.environ.get("COCOTB_RESULTS_FILE", "results.xml")
+
+_started = time.time()
+_callbacks = []
+
+
+def on_results(callback):
+    _callbacks.append(callback)
+    return callback
+
+
+def read(path=RESULTS_FILE, since=None):
+    # test name -> True for a pass, False for a failure, skipped tests left out
+    if not os.path.exists(path):
+        return None
+    if since is not None and os.path.getmtime(path) < since:
+        return None
+    try:
+        root = ET.parse(path).getroot()
+    except ET.ParseError:
+        return None
+    results = {}
+    for case in root.iter("testcase"):
+        if case.find("skipped") is not None:
+            continue
+        failed = case.find("failure") is not None or case.find("error") is not None
+        results[case.get("name")] = not failed
+    return results
+
+
+@atexit.register
+def _report():
+    if not _callbacks:
+        return
+    results = read(since=_started)
+    if results is None:
+        return
+    for callback in _callbacks:
+        callback(results)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# Runs the benchmarks in bench.py and keeps their numbers in a history file.
+#
+#   python run_bench.py SIM=verilator
+#
+# Each run is stored in bench_history.json under the git revision (with
+# -dirty for uncommitted changes) and the simulator, replacing an earlier
+# run of the same revision. It is then compared against the most recent
+# other revision run on the same simulator: a drop in cycles per second, a
+# rise in peak RSS or a rise in the cycles per instruction of a program
+# beyond the threshold is flagged and the exit status is 1.
+# Anything of the form NAME=value is passed on to make.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(TEST_DIR, "bench_history.json")
+RESULTS_FILE = os.path.join(TEST_DIR, "sim_build", "bench_results.json")
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd=TEST_DIR, capture_output=True, text=True
+        ).stdout.strip()
+
+    revision = git("rev-parse", "--short", "HEAD") or "unknown"
+    if git("status", "--porcelain", "--untracked-files=no"):
+        revision += "-dirty"
+    return revision
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_history(history, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(history, f, indent=2, sort_keys=False)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def baseline(history, revision, simulator):
+    # the newest run of another revision on the same simulator
+    for other in reversed(list(history)):
+        if other != revision and simulator in history[other]:
+            return other, history[other][simulator]
+    return None, None
+
+
+def regressions(results, previous, threshold):
+    flagged = []
+    for name, now in results.items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        speed = now["cycles_per_s"] / before["cycles_per_s"] - 1
+        if speed < -threshold:
+            flagged.append(f"{name}: cycles/s {speed:+.1%}")
+        memory = now["peak_rss_mb"] / before["peak_rss_mb"] - 1
+        if memory > threshold:
+            flagged.append(f"{name}: peak RSS {memory:+.1%}")
+    return flagged
+
+
+def cpi_regressions(cpi, previous, threshold):
+    flagged = []
+    for name, now in cpi.items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        change = now["cpi"] / before["cpi"] - 1
+        if change > threshold:
+            flagged.append(f"{name}: CPI {change:+.1%}")
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="run the throughput benchmarks and track them by revision"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="relative change flagged as a regression (default 0.10)",
+    )
+    parser.add_argument("--history", default=HISTORY_FILE, help="history JSON file")
+    parser.add_argument(
+        "make_args", nargs="*", metavar="NAME=value", help="passed on to make"
+    )
+    args = parser.parse_args(argv)
+
+    if os.path.exists(RESULTS_FILE):
+        os.remove(RESULTS_FILE)
+    env = dict(os.environ, BENCH_RESULTS=RESULTS_FILE)
+    subprocess.check_call(
+        [
+            "make",
+            "--no-print-directory",
+            "MODULE=bench",
+            "COCOTB_RESULTS_FILE=sim_build/bench.xml",
+        ]
+        + args.make_args,
+        cwd=TEST_DIR,
+        env=env,
+    )
+    with open(RESULTS_FILE) as f:
+        run = json.load(f)
+    simulator = run["simulator"]
+    results = run["results"]
+    cpi = run.get("cpi", {})
+
+    revision = git_revision()
+    history = load_history(args.history)
+    previous_revision, previous_run = baseline(history, revision, simulator)
+
+    print(f"{revision} on {simulator}")
+    for name, numbers in results.items():
+        print(
+            f"  {name:<24} {numbers['cycles_per_s']:>10.0f} cycles/s"
+            f"  wall {numbers['wall_s']:.1f} s"
+            f"  peak RSS {numbers['peak_rss_mb']:.0f} MB"
+        )
+    for name, totals in cpi.items():
+        print(
+            f"  {name:<24} {totals['instructions']:>10} instructions"
+            f"  {totals['clocks']} clocks  CPI {totals['cpi']:.2f}"
+        )
+
+    # re-inserting keeps the history in the order the revisions were run
+    entry = history.pop(revision, {})
+    entry[simulator] = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+        "cpi": cpi,
+    }
+    history[revision] = entry
+    save_history(history, args.history)
+
+    if previous_run is None:
+        print("no earlier revision to compare against")
+        return 0
+    flagged = regressions(results, previous_run["results"], args.threshold)
+    flagged += cpi_regressions(cpi, previous_run.get("cpi", {}), args.threshold)
+    if not flagged:
+        print(f"no regressions against {previous_revision}")
+        return 0
+    print(f"regressions against {previous_revision}:")
+    for line in flagged:
+        print(f"  {line}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
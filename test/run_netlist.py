@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# Checks a Yosys netlist of tt_um_6502 against the RTL on a sample of the
+# tests in test.py, without a PDK or a hardened gate_level_netlist.v.
+#
+#   python run_netlist.py -n 8 SIM=verilator
+#
+# The sampled tests run under MODULE=netlist twice with the same
+# RANDOM_SEED, on the RTL and then with GATES=yosys on a generic cell
+# netlist synthesized from it (make YOSYS=yowasp-yosys without a yosys on
+# the path). Every test hashes the bus transactions it saw, and a test
+# whose hashes differ, or that fails on either side, is reported. Anything
+# of the form NAME=value is passed on to make.
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from run_shards import find_tests
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = os.path.join("sim_build", "netlist")
+
+SIDES = (("rtl", []), ("yosys", ["GATES=yosys"]))
+
+
+def failures(results):
+    # names of the failing tests in a results file
+    root = ET.parse(os.path.join(TEST_DIR, results)).getroot()
+    return {
+        case.get("name")
+        for case in root.iter("testcase")
+        if case.find("failure") is not None
+    }
+
+
+def run_side(name, gates, tests, make_args):
+    hashes = os.path.join(WORK_DIR, f"{name}.json")
+    results = os.path.join(WORK_DIR, f"{name}.xml")
+    log = os.path.join(WORK_DIR, f"{name}.log")
+    for path in (hashes, results):
+        if os.path.exists(os.path.join(TEST_DIR, path)):
+            os.remove(os.path.join(TEST_DIR, path))
+    subprocess.check_call(
+        ["make", "--no-print-directory", "build"] + gates + make_args, cwd=TEST_DIR
+    )
+    command = (
+        [
+            "make",
+            "--no-print-directory",
+            "MODULE=netlist",
+            f"TESTCASE={','.join(tests)}",
+            f"BUS_HASHES={hashes}",
+            f"COCOTB_RESULTS_FILE={results}",
+        ]
+        + gates
+        + make_args
+    )
+    start = time.monotonic()
+    with open(os.path.join(TEST_DIR, log), "w") as f:
+        subprocess.call(command, cwd=TEST_DIR, stdout=f, stderr=subprocess.STDOUT)
+    print(f"  {name}: {time.monotonic() - start:.1f}s, {log}")
+    if not os.path.exists(os.path.join(TEST_DIR, hashes)):
+        return {}, set(tests)
+    with open(os.path.join(TEST_DIR, hashes)) as f:
+        return json.load(f), failures(results)
+
+
+def compare(tests, rtl, netlist):
+    # (test, what is wrong) for every test that doesn't match
+    mismatches = []
+    for test in tests:
+        if test not in rtl or test not in netlist:
+            mismatches.append((test, "did not run on both"))
+        elif rtl[test] != netlist[test]:
+            mismatches.append(
+                (
+                    test,
+                    f"{rtl[test]['transactions']} transactions on the RTL,"
+                    f" {netlist[test]['transactions']} on the netlist,"
+                    f" hashes {rtl[test]['sha256'][:12]}"
+                    f" and {netlist[test]['sha256'][:12]}",
+                )
+            )
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="compare a Yosys netlist against the RTL on sampled tests"
+    )
+    parser.add_argument(
+        "-n", "--sample", type=int, default=8, help="number of tests to sample"
+    )
+    parser.add_argument(
+        "-t", "--test", action="append", help="run this test, instead of sampling"
+    )
+    parser.add_argument(
+        "--seed", type=int, help="RANDOM_SEED for the tests and the sample"
+    )
+    parser.add_argument(
+        "make_args", nargs="*", metavar="NAME=value", help="passed on to make"
+    )
+    args = parser.parse_intermixed_args(argv)
+
+    seed = int(time.time()) if args.seed is None else args.seed
+    tests = find_tests()
+    if args.test:
+        tests = [test for test in tests if test in args.test]
+    else:
+        chosen = set(random.Random(seed).sample(tests, min(args.sample, len(tests))))
+        tests = [test for test in tests if test in chosen]
+    os.makedirs(os.path.join(TEST_DIR, WORK_DIR), exist_ok=True)
+    make_args = args.make_args + [f"RANDOM_SEED={seed}"]
+
+    print(f"running {len(tests)} tests on the RTL and the netlist, RANDOM_SEED={seed}")
+    (rtl, rtl_failed), (netlist, netlist_failed) = (
+        run_side(name, gates, tests, make_args) for name, gates in SIDES
+    )
+    mismatches = compare(tests, rtl, netlist)
+    for test in tests:
+        failed = [
+            side
+            for side, names in (("RTL", rtl_failed), ("netlist", netlist_failed))
+            if test in names
+        ]
+        if failed:
+            mismatches.append((test, f"failed on the {' and the '.join(failed)}"))
+    for test, problem in mismatches:
+        print(f"  {test}: {problem}")
+    print(f"{len(tests) - len({t for t, _ in mismatches})}/{len(tests)} match")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
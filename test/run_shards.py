@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# Runs the cocotb tests in test.py split over several simulator processes.
+#
+#   python run_shards.py -j 16 SIM=verilator
+#
+# The model is built once with make build, then every shard runs its share
+# of the tests with TESTCASE against that build and writes its own results
+# file. Those are merged back into results.xml in test.py order. Tests are
+# spread by the times in the last results.xml when there is one, otherwise
+# round robin. Anything of the form NAME=value is passed on to make.
+# Every shard gets the same RANDOM_SEED, picked here unless one is given, so
+# each iteration draws what it would in a single make (see seeds.py).
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARD_DIR = os.path.join("sim_build", "shards")
+
+
+def find_tests(path=os.path.join(TEST_DIR, "test.py")):
+    # names of the @cocotb.test() coroutines in file order, without importing
+    # test.py since that needs a running simulator
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    tests = []
+    for node in tree.body:
+        if not isinstance(node, ast.AsyncFunctionDef):
+            continue
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Call):
+                decorator = decorator.func
+            if ast.unparse(decorator) == "cocotb.test":
+                tests.append(node.name)
+    return tests
+
+
+def previous_times(path):
+    # test name -> wall time from an earlier results.xml
+    if not os.path.exists(path):
+        return {}
+    try:
+        root = ET.parse(path).getroot()
+    except ET.ParseError:
+        return {}
+    return {
+        case.get("name"): float(case.get("time", 0)) for case in root.iter("testcase")
+    }
+
+
+def split(tests, shards, times):
+    # longest first onto the least loaded shard, unknown tests count as the
+    # average so a new test doesn't all land in one shard
+    if not times:
+        return [tests[i::shards] for i in range(shards)]
+    known = [times[t] for t in tests if t in times]
+    default = sum(known) / len(known) if known else 1.0
+    loads = [0.0] * shards
+    groups = [[] for _ in range(shards)]
+    for test in sorted(tests, key=lambda t: -times.get(t, default)):
+        i = loads.index(min(loads))
+        groups[i].append(test)
+        loads[i] += times.get(test, default)
+    return [g for g in groups if g]
+
+
+def run_shard(index, tests, make_args):
+    results = os.path.join(SHARD_DIR, f"results_{index}.xml")
+    log = os.path.join(SHARD_DIR, f"shard_{index}.log")
+    command = [
+        "make",
+        "--no-print-directory",
+        f"TESTCASE={','.join(tests)}",
+        f"COCOTB_RESULTS_FILE={results}",
+    ] + make_args
+    start = time.monotonic()
+    with open(os.path.join(TEST_DIR, log), "w") as f:
+        returncode = subprocess.call(
+            command, cwd=TEST_DIR, stdout=f, stderr=subprocess.STDOUT
+        )
+    return index, results, log, returncode, time.monotonic() - start
+
+
+def merge(shard_results, tests, output):
+    # one testsuite with every testcase back in test.py order, a test that
+    # never reported (a crashed shard) gets a failure so CI still sees it
+    cases = {}
+    properties = []
+    for index, path in shard_results:
+        full_path = os.path.join(TEST_DIR, path)
+        if not os.path.exists(full_path):
+            continue
+        root = ET.parse(full_path).getroot()
+        for prop in root.iter("property"):
+            properties.append(
+                ET.Element(
+                    "property",
+                    name=f"shard_{index}_{prop.get('name')}",
+                    value=prop.get("value"),
+                )
+            )
+        for case in root.iter("testcase"):
+            cases[case.get("name")] = case
+
+    suites = ET.Element("testsuites", name="results")
+    suite = ET.SubElement(suites, "testsuite", name="all", package="all")
+    suite.extend(properties)
+    for test in tests:
+        case = cases.get(test)
+        if case is None:
+            case = ET.Element("testcase", name=test, classname="test")
+            ET.SubElement(case, "failure", message="shard did not report this test")
+        suite.append(case)
+    ET.indent(suites)
+    ET.ElementTree(suites).write(os.path.join(TEST_DIR, output), encoding="unicode")
+    return sum(1 for case in suite if case.find("failure") is not None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="run the cocotb tests in parallel shards"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="number of shards"
+    )
+    parser.add_argument(
+        "-o", "--output", default="results.xml", help="merged results file"
+    )
+    parser.add_argument(
+        "make_args", nargs="*", metavar="NAME=value", help="passed on to make"
+    )
+    args = parser.parse_args(argv)
+
+    tests = find_tests()
+    groups = split(
+        tests, max(1, args.jobs), previous_times(os.path.join(TEST_DIR, args.output))
+    )
+    os.makedirs(os.path.join(TEST_DIR, SHARD_DIR), exist_ok=True)
+    if not any(arg.startswith("RANDOM_SEED=") for arg in args.make_args):
+        args.make_args.append(f"RANDOM_SEED={int(time.time())}")
+
+    # build once up front so the shards don't race to compile the model
+    subprocess.check_call(
+        ["make", "--no-print-directory", "build"] + args.make_args, cwd=TEST_DIR
+    )
+
+    seed = [arg for arg in args.make_args if arg.startswith("RANDOM_SEED=")][-1]
+    print(f"running {len(tests)} tests in {len(groups)} shards, {seed}")
+    start = time.monotonic()
+    shard_results = []
+    crashed = False
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        runs = [
+            pool.submit(run_shard, i, group, args.make_args)
+            for i, group in enumerate(groups)
+        ]
+        for run in runs:
+            index, results, log, returncode, seconds = run.result()
+            status = "ok" if returncode == 0 else f"make exited {returncode}"
+            print(
+                f"  shard {index}: {len(groups[index])} tests, {seconds:.1f}s, {status}, {log}"
+            )
+            crashed |= returncode != 0
+            shard_results.append((index, results))
+
+    failures = merge(shard_results, tests, args.output)
+    print(
+        f"{len(tests) - failures}/{len(tests)} passed in {time.monotonic() - start:.1f}s,"
+        f" results in {args.output}"
+    )
+    return 1 if failures or crashed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
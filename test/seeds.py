@@ -0,0 +1,87 @@
+# Per iteration seeds for the randomized tests.
+#
+# The main loop of every test in test.py goes through iterations() instead
+# of range(). Each iteration reseeds random with a seed derived from the
+# root seed (cocotb's RANDOM_SEED), the test name and the iteration number,
+# so an iteration draws the same values whatever ran before it. When a test
+# fails, the iteration it was in and how to run just that one again are
+# printed once the run is over (see results.py):
+#
+#   make TESTCASE=test_ADC_ABS_Base SEED_ITERATION=17 SEED=2856130157
+#
+# SEED_ITERATION runs only that iteration of the loop (counted from 0, not
+# the loop value) and SEED replaces the derived seed, so the rerun doesn't
+# depend on RANDOM_SEED. Every iteration resets the cpu, nothing but the
+# seed carries over from the ones before it. The test name is the name of
+# the function running the loop, which cocotb uses for the test as well.
+
+import hashlib
+import inspect
+import os
+import random
+import sys
+
+import cocotb
+
+import results
+
+ITERATION = os.environ.get("SEED_ITERATION")
+SEED = os.environ.get("SEED")
+
+NO_TEST = "<no test>"
+
+
+class Iteration:
+    def __init__(self, test, index, seed):
+        self.test = test
+        self.index = index
+        self.seed = seed
+
+    def rerun(self):
+        return f"make TESTCASE={self.test} SEED_ITERATION={self.index} SEED={self.seed}"
+
+    def __str__(self):
+        return f"iteration {self.index} with seed {self.seed}"
+
+
+# test -> the Iteration it is in, until its loop finishes. A test that
+# fails (in the loop or in a forked task like the Lockstep checker) never
+# gets to the end of the loop and is left in here.
+running = {}
+
+
+def derive(root, test, index):
+    digest = hashlib.sha1(f"{root}/{test}/{index}".encode()).digest()
+    return int.from_bytes(digest[:4], "little")
+
+
+def iterations(*args):
+    # range(*args), reseeding random before every value
+    values = range(*args)
+    # the frame that runs the loop
+    caller = inspect.currentframe().f_back
+    test = caller.f_code.co_name if caller is not None else NO_TEST
+    indices = range(len(values))
+    if ITERATION is not None:
+        index = int(ITERATION)
+        if index not in indices:
+            raise ValueError(f"{test} has no iteration {index}, only {len(values)}")
+        indices = [index]
+    for index in indices:
+        if SEED is not None:
+            seed = int(SEED, 0)
+        else:
+            seed = derive(cocotb.RANDOM_SEED, test, index)
+        random.seed(seed)
+        running[test] = Iteration(test, index, seed)
+        yield values[index]
+    running.pop(test, None)
+
+
+@results.on_results
+def _report(outcomes):
+    for test, passed in outcomes.items():
+        iteration = running.get(test)
+        if not passed and iteration is not None:
+            print(f"{test} failed in {iteration}, rerun it with", file=sys.stderr)
+            print(f"  {iteration.rerun()}", file=sys.stderr)
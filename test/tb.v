@@ -6,11 +6,43 @@
 */
 module tb ();
 
-  // Dump the signals to a VCD file. You can view it with gtkwave or surfer.
-  initial begin
-    $dumpfile("tb.vcd");
-    $dumpvars(0, tb);
-    #1;
+  // Waveforms are off until a test turns them on from Python through
+  // dump_enable, see waves.py. The first time they go on dump_scope picks
+  // what goes in the file, the simulators only allow one $dumpvars per run.
+  // Build with DUMP=vcd or DUMP=fst to pick the format, the file is tb.vcd
+  // or tb.fst. You can view it with gtkwave or surfer. Verilator releases
+  // that don't take the scope of $dumpvars dump the whole design.
+  localparam DUMP_ALL = 2'd0;
+  localparam DUMP_PORTS = 2'd1;
+  localparam DUMP_DECODER = 2'd2;
+  localparam DUMP_ALU = 2'd3;
+
+  reg dump_enable = 0;
+  reg [1:0] dump_scope = DUMP_ALL;
+  reg dump_started;
+  reg [8*16-1:0] dump_file;
+  initial dump_started = 0;
+
+`ifdef DUMP_TRACE
+  // Verilator only traces a model that allowed it before time 0
+  initial $c("Verilated::traceEverOn(true);");
+`endif
+
+  always @(dump_enable) begin
+    if (dump_enable && !dump_started) begin
+      if (!$value$plusargs("dumpfile=%s", dump_file)) dump_file = "tb.vcd";
+      $dumpfile(dump_file);
+      case (dump_scope)
+        DUMP_PORTS: $dumpvars(1, tb);
+        DUMP_DECODER: $dumpvars(0, tb.user_project.instructionDecode);
+        DUMP_ALU: $dumpvars(0, tb.user_project.ALU);
+        default: $dumpvars(0, tb);
+      endcase
+      dump_started = 1;
+    end else if (dump_started) begin
+      if (dump_enable) $dumpon;
+      else $dumpoff;
+    end
   end
 
   // Wire up the inputs and outputs:
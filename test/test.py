@@ -3,12 +3,29 @@
 
 import cocotb
 from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, FallingEdge, RisingEdge, with_timeout
+from cocotb.utils import get_sim_time
+import os
 import random
 
 import helper
+import incremental
+import seeds
+from assembler import assemble
+from cosim import Lockstep
+from cpi import CpiSampler
+from disasm import Decoder
+from func_coverage import Coverage, Generator
+from memory import PAGE_STROBE, Memory
+from model import Cpu
+from monitor import BusMonitor
+from opcodes import IMPLEMENTED
+from random_program import ProgramGenerator
 
 MAX_TESTS = 8  # for the fuzz tests
 MAX_TEST_NUM = 255  # for the instruction specific tests
+# the hardened netlist keeps none of the internals some tests look at
+GL_TEST = os.environ.get("GATES") == "yes"
 
 
 @cocotb.test()
@@ -18,7 +35,7 @@ async def test_ASL_ZPG_Clear(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
 
@@ -47,7 +64,7 @@ async def test_ASL_ZPG_Base(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.test_zpg_instruction(
@@ -67,7 +84,7 @@ async def test_LSR_ZPG_Clear(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
 
@@ -95,7 +112,7 @@ async def test_LSR_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.test_zpg_instruction(
@@ -115,7 +132,7 @@ async def test_ROL_ZPG_Loop(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
 
@@ -146,7 +163,7 @@ async def test_ROL_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.test_zpg_instruction(
@@ -166,7 +183,7 @@ async def test_ROR_ZPG_Loop(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
 
@@ -197,7 +214,7 @@ async def test_ROR_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.test_zpg_instruction(
@@ -217,7 +234,7 @@ async def test_ASL_ABS_Clear(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(1, 255)
         await helper.reset_cpu(dut)
@@ -247,7 +264,7 @@ async def test_ASL_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(1, 255)
         await helper.reset_cpu(dut)
@@ -269,7 +286,7 @@ async def test_LSR_ABS_Clear(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(1, 255)
         await helper.reset_cpu(dut)
@@ -299,7 +316,7 @@ async def test_LSR_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(1, 255)
         await helper.reset_cpu(dut)
@@ -321,7 +338,7 @@ async def test_ROL_ABS_Loop(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(1, 255)
         await helper.reset_cpu(dut)
@@ -354,7 +371,7 @@ async def test_ROL_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(1, 255)
         await helper.reset_cpu(dut)
@@ -376,7 +393,7 @@ async def test_ROR_ABS_Loop(dut):
     cocotb.start_soon(clock.start())
 
     # test instruction on it's own
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(1, 255)
         await helper.reset_cpu(dut)
@@ -409,7 +426,7 @@ async def test_ROR_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(1, 255)
         await helper.reset_cpu(dut)
@@ -429,7 +446,7 @@ async def test_LDX_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -445,7 +462,7 @@ async def test_LDX_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value_HB = random.randint(10, 255)
         memory_addr_with_value_LB = random.randint(10, 255)
         await helper.reset_cpu(dut)
@@ -473,7 +490,7 @@ async def test_LDX_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -490,7 +507,7 @@ async def test_LDA_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -506,7 +523,7 @@ async def test_LDA_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -535,7 +552,7 @@ async def test_LDA_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -552,7 +569,7 @@ async def test_LDY_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -568,7 +585,7 @@ async def test_LDY_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, 256):
+    for test_num in seeds.iterations(1, 256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -597,7 +614,7 @@ async def test_LDY_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -615,7 +632,7 @@ async def test_AND_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         acc_value = random.randint(0, 255)
         await helper.reset_cpu(dut)
@@ -641,7 +658,7 @@ async def test_AND_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -678,7 +695,7 @@ async def test_AND_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -713,7 +730,7 @@ async def test_ORA_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         acc_value = random.randint(0, 255)
         await helper.reset_cpu(dut)
@@ -739,7 +756,7 @@ async def test_ORA_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -776,7 +793,7 @@ async def test_ORA_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -811,7 +828,7 @@ async def test_EOR_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         acc_value = random.randint(0, 255)
         await helper.reset_cpu(dut)
@@ -837,7 +854,7 @@ async def test_EOR_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -874,7 +891,7 @@ async def test_EOR_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -909,7 +926,7 @@ async def test_CPX_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -956,7 +973,7 @@ async def test_CPX_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -1004,7 +1021,7 @@ async def test_CPX_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -1050,7 +1067,7 @@ async def test_CMP_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -1097,7 +1114,7 @@ async def test_CMP_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -1145,7 +1162,7 @@ async def test_CMP_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -1191,7 +1208,7 @@ async def test_CPY_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -1238,7 +1255,7 @@ async def test_CPY_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -1286,7 +1303,7 @@ async def test_CPY_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
 
@@ -1332,7 +1349,7 @@ async def test_ADC_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         acc_value = random.randint(0, 255)
         await helper.reset_cpu(dut)
@@ -1358,7 +1375,7 @@ async def test_ADC_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -1395,7 +1412,7 @@ async def test_ADC_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -1430,7 +1447,7 @@ async def test_SBC_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value = random.randint(10, 255)
         acc_value = random.randint(0, 255)
         await helper.reset_cpu(dut)
@@ -1456,7 +1473,7 @@ async def test_SBC_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_HB = random.randint(10, 255)
         memory_addr_with_value_LB = random.randint(10, 255)
 
@@ -1494,7 +1511,7 @@ async def test_SBC_IMM_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(256):
+    for test_num in seeds.iterations(256):
         memory_addr_with_value_LB = random.randint(10, 255)
         memory_addr_with_value_HB = random.randint(10, 255)
         acc_value = random.randint(0, 255)
@@ -1529,7 +1546,7 @@ async def test_INC_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.test_zpg_instruction(
@@ -1548,7 +1565,7 @@ async def test_INC_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_HB = random.randint(10, 255)
         memory_addr_with_value_LB = random.randint(10, 255)
 
@@ -1570,7 +1587,7 @@ async def test_DEC_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.test_zpg_instruction(
@@ -1589,7 +1606,7 @@ async def test_DEC_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         memory_addr_with_value_HB = random.randint(10, 255)
         memory_addr_with_value_LB = random.randint(10, 255)
         await helper.reset_cpu(dut)
@@ -1610,7 +1627,7 @@ async def test_JMP_ABS_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(MAX_TEST_NUM):
+    for test_num in seeds.iterations(MAX_TEST_NUM):
         goal_HB = random.randint(1, 255)
         memory_addr_with_value_LB = random.randint(10, 255)
         goal_LB = test_num
@@ -1641,7 +1658,7 @@ async def test_BCS_REL_Branch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1669,7 +1686,7 @@ async def test_BCS_REL_NoBranch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1697,7 +1714,7 @@ async def test_BCC_REL_Branch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1729,7 +1746,7 @@ async def test_BCC_REL_NoBranch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1756,7 +1773,7 @@ async def test_BEQ_REL_Branch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 5):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 5):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1784,7 +1801,7 @@ async def test_BEQ_REL_NoBranch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1806,7 +1823,7 @@ async def test_BNE_REL_Branch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1828,7 +1845,7 @@ async def test_BNE_REL_NoBranch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 5):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 5):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1856,7 +1873,7 @@ async def test_BPL_REL_Branch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1878,7 +1895,7 @@ async def test_BPL_REL_NoBranch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1906,7 +1923,7 @@ async def test_BMI_REL_Branch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1934,7 +1951,7 @@ async def test_BMI_REL_NoBranch(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM - 4):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM - 4):
         memory_addr_for_verify = random.randint(10, 255)
 
         await helper.reset_cpu(dut)
@@ -1955,7 +1972,7 @@ async def test_INX_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -1977,7 +1994,7 @@ async def test_INY_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -1999,7 +2016,7 @@ async def test_DEX_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2021,7 +2038,7 @@ async def test_DEY_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2043,7 +2060,7 @@ async def test_ASL_A_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2065,7 +2082,7 @@ async def test_LSR_A_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2087,7 +2104,7 @@ async def test_ROL_A_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2109,7 +2126,7 @@ async def test_ROR_A_ZPG_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2131,7 +2148,7 @@ async def test_TAX_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2148,7 +2165,7 @@ async def test_TAY_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2165,7 +2182,7 @@ async def test_TXA_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2182,7 +2199,7 @@ async def test_TYA_Base(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for test_num in range(1, MAX_TEST_NUM):
+    for test_num in seeds.iterations(1, MAX_TEST_NUM):
         memory_addr_with_value = random.randint(10, 255)
         await helper.reset_cpu(dut)
         await helper.run_input_zpg_instruction(
@@ -2199,7 +2216,7 @@ async def test_all_load_transfer_store_fuzz(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for _ in range(MAX_TESTS):
+    for _ in seeds.iterations(MAX_TESTS):
         await helper.reset_cpu(dut)
         register_state = [0, 0, 0]
         pc = 1
@@ -2277,7 +2294,7 @@ async def test_add_matrix_fuzz(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for _ in range(MAX_TESTS):
+    for _ in seeds.iterations(MAX_TESTS):
         await helper.reset_cpu(dut)
 
         memory_page_0 = [
@@ -2386,7 +2403,7 @@ async def test_multiply_nums_fuzz(dut):
     clock = Clock(dut.clk, 25, units="ns")
     cocotb.start_soon(clock.start())
 
-    for _ in range(MAX_TESTS):
+    for _ in seeds.iterations(MAX_TESTS):
         await helper.reset_cpu(dut)
 
         # initialize memory page 0
@@ -2499,3 +2516,527 @@ async def test_multiply_nums_fuzz(dut):
                 )
             t += 1
         assert memory_page_0[252] == (a * b) % 256
+
+
+# a * b by repeated addition, result ends up in $fc
+MULTIPLY_PROGRAM = """
+a = $fa
+b = $fb
+result = $fc
+        nop
+        cmp b
+loop:   bne add         ; DEC sets Z once b runs out
+        jmp done
+add:    adc a
+        dec b
+        jmp loop
+        .org 100
+done:   sta result
+trap:   jmp trap
+"""
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_multiply_nums_program(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        memory = Memory(dut)
+        program = assemble(MULTIPLY_PROGRAM)
+        program.load(memory)
+
+        a = random.randint(0, 255)
+        b = random.randint(0, 255)
+        memory[program["a"]] = a
+        memory[program["b"]] = b
+
+        expected = Cpu(memory.data)
+        expected.run(100000, until_pc=program["trap"])
+        lockstep = Lockstep(dut, Cpu(memory.data))
+
+        memory.start()
+        lockstep.start()
+        await helper.hold_reset(dut)
+        await with_timeout(memory.wait_for_write(program["result"]), 2, "ms")
+        memory.stop()
+        lockstep.stop()
+
+        assert memory[program["result"]] == (a * b) % 256
+        assert memory.data == expected.mem
+        assert lockstep.retired > 0
+
+
+@cocotb.test()
+async def test_trace_decoder(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        a = random.randint(0, 255)
+        b = random.randint(0, 255)
+        decoder = Decoder()
+        decoded = []
+        memory = Memory(dut, trace=decoder.attach(decoded.append))
+        program = assemble(MULTIPLY_PROGRAM)
+        program.load(memory)
+        memory[program["a"]] = a
+        memory[program["b"]] = b
+
+        expected = Cpu(memory.data)
+        pcs = []
+        while expected.pc != program["trap"]:
+            pcs.append(expected.pc)
+            expected.step()
+
+        memory.start()
+        await helper.hold_reset(dut)
+        await with_timeout(memory.wait_for_write(program["result"]), 2, "ms")
+        memory.stop()
+        decoded += decoder.finish()
+
+        # every instruction the model ran, then the fetch of the trap
+        assert [i.pc for i in decoded] == pcs + [program["trap"]]
+        assert all(i.read == a for i in decoded if i.op.mnemonic == "ADC")
+        store = decoded[-2]
+        assert store.op.mnemonic == "STA" and store.address == program["result"]
+        assert store.written == (a * b) % 256
+        assert all(i.cycles > 0 for i in decoded)
+
+
+# every operand points at the instruction after it, so the next fetch
+# repeats the address read last
+NEXT_PC_PROGRAM = """
+        nop
+        lda 3           ; ZPG
+        adc next        ; ABS, a forward reference
+next:   sta $80
+trap:   jmp trap
+"""
+
+
+@cocotb.test()
+async def test_trace_decoder_next_pc_operands(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    decoder = Decoder()
+    decoded = []
+    memory = Memory(dut, trace=decoder.attach(decoded.append))
+    program = assemble(NEXT_PC_PROGRAM)
+    program.load(memory)
+
+    expected = Cpu(memory.data)
+    pcs = []
+    while expected.pc != program["trap"]:
+        pcs.append(expected.pc)
+        expected.step()
+
+    memory.start()
+    await helper.hold_reset(dut)
+    await with_timeout(memory.wait_for_write(0x80), 100, "us")
+    memory.stop()
+    decoded += decoder.finish()
+
+    assert [i.pc for i in decoded] == pcs + [program["trap"]]
+    lda, adc = decoded[1:3]
+    assert lda.address == 3 and lda.read == memory[3]
+    assert adc.address == program["next"] and adc.read == memory[program["next"]]
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_cpi_sampler(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        memory = Memory(dut)
+        program = assemble(MULTIPLY_PROGRAM)
+        program.load(memory)
+        memory[program["a"]] = random.randint(0, 255)
+        memory[program["b"]] = random.randint(0, 255)
+
+        expected = Cpu(memory.data)
+        counts = {}
+        while expected.pc != program["trap"]:
+            opcode = expected.mem[expected.pc]
+            counts[opcode] = counts.get(opcode, 0) + 1
+            expected.step()
+        sampler = CpiSampler(dut)
+
+        await helper.hold_reset(dut)
+        memory.start()
+        sampler.start()
+        await with_timeout(memory.wait_for_write(program["result"]), 2, "ms")
+        # the store lands in the fetch of the trap, two bus cycles later the
+        # trap's S_OPCODE_READ has been seen and the store counted
+        await ClockCycles(dut.clk, 4)
+        memory.stop()
+        sampler.stop()
+
+        # every instruction up to the trap, each opcode always as long
+        rows = sampler.table.rows
+        assert {opcode: row[0] for opcode, row in rows.items()} == counts
+        assert all(fewest == most for _, _, fewest, most in rows.values())
+        assert sampler.table.instructions == sum(counts.values())
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_bus_monitor(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        a = random.randint(0, 255)
+        b = random.randint(0, 255)
+        for page_mode in (False, True):
+            seen = []
+            memory = Memory(
+                dut,
+                trace=lambda *transaction: seen.append(transaction),
+                page_mode=page_mode,
+            )
+            program = assemble(MULTIPLY_PROGRAM)
+            program.load(memory)
+            memory[program["a"]] = a
+            memory[program["b"]] = b
+            # small enough to spill a few times
+            monitor = BusMonitor(
+                dut, capacity=16, spill="sim_build/monitor_spill.bin"
+            )
+
+            # after the reset, so neither sees the tail of the last run
+            await helper.hold_reset(dut)
+            memory.start()
+            monitor.start()
+            await with_timeout(memory.wait_for_write(program["result"]), 2, "ms")
+            memory.stop()
+            # the memory model writes mid phase, the monitor sees it on the edge
+            await RisingEdge(dut.clk)
+            monitor.stop()
+
+            # the monitor and the memory model agree on every bus cycle, page
+            # hits included
+            monitored = list(monitor)
+            assert monitor.buffer.spilled > 0
+            assert [t[:3] for t in monitored] == seen, f"page_mode={page_mode}"
+            assert [t[3] for t in monitored] == list(range(len(seen)))
+            assert list(monitor.buffer.latest(8)["address"]) == [
+                t[0] for t in seen[-8:]
+            ]
+
+
+# where test_coverage_closure puts each vector and its memory operand
+VECTOR_PC = 0x0200
+VECTOR_ZPG = 0x20
+VECTOR_ABS = 0x0320
+
+
+def _trap(memory, address):
+    memory.load([helper.hex_to_num("4c"), address & 0xFF, address >> 8], address)
+
+
+async def run_vector(dut, memory, coverage, vector):
+    # one instruction from a loaded state, checked by the model in lockstep
+    op = IMPLEMENTED[vector.opcode]
+    pc = VECTOR_PC
+    code = [op.value]
+    if op.mnemonic == "JMP":
+        target = pc + 3
+        code += [target & 0xFF, target >> 8]
+    elif op.mode in ("IMM", "REL"):
+        code.append(vector.operand)
+    elif op.mode == "ZPG":
+        code.append(VECTOR_ZPG)
+    elif op.mode == "ABS":
+        code += [VECTOR_ABS & 0xFF, VECTOR_ABS >> 8]
+    memory.load(code, pc)
+    _trap(memory, pc + len(code))
+    if op.mode == "REL":
+        _trap(memory, pc + 1 + vector.operand)
+    memory[VECTOR_ZPG] = vector.operand
+    memory[VECTOR_ABS] = vector.operand
+
+    cpu = Cpu(memory.data, pc=pc)
+    cpu.a, cpu.x, cpu.y, cpu.p = vector.a, vector.x, vector.y, vector.p
+    lockstep = Lockstep(dut, cpu)
+    lockstep.observers.append(coverage.sample)
+
+    # started with the load, the first opcode is read one clock after it
+    lockstep.start()
+    await helper.load_state(dut, vector.a, vector.x, vector.y, vector.p, pc)
+    # the vector, then the trap twice so a store has landed
+    for _ in range(100):
+        if lockstep.retired >= 3:
+            break
+        await ClockCycles(dut.clk, 2)
+    lockstep.stop()
+    assert lockstep.retired >= 3, f"{vector} did not finish"
+    assert memory.data == cpu.mem, f"{vector} left memory different to the model"
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_coverage_closure(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    coverage = Coverage()
+    generator = Generator(coverage)
+    memory = Memory(dut)
+    await helper.hold_reset(dut)
+    memory.start()
+    coverage.start_fsm(dut)
+
+    # every vector aims at a bin nobody has hit, so closure should take
+    # about one vector per bin rather than the thousands blind random needs
+    goal = coverage.missing()
+    vectors = 0
+    while coverage.missing() and vectors < 2 * goal:
+        await run_vector(dut, memory, coverage, generator.next())
+        vectors += 1
+    coverage.stop_fsm()
+    memory.stop()
+
+    summary = coverage.summary()
+    dut._log.info(
+        f"{summary['bins']}/{summary['goal']} bins in {vectors} vectors,"
+        f" FSM states never visited: {summary['unvisited_states']}"
+    )
+    if os.environ.get("COVERAGE_FILE"):
+        coverage.save(os.environ["COVERAGE_FILE"])
+    assert coverage.missing() == 0
+    assert vectors <= goal + goal // 4
+
+
+# $0700+i = $0500+i + $0600+i, the STXs step the three addresses along
+ADD_MATRIX_PROGRAM = """
+        nop
+        ldx #0
+loop:
+load_a: adc $0500
+load_b: adc $0600
+store:  sta $0700
+        lda #0
+        inx
+        stx load_a + 1
+        stx load_b + 1
+        stx store + 1
+        jmp loop
+"""
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_add_matrix_program(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        memory = Memory(dut)
+        assemble(ADD_MATRIX_PROGRAM).load(memory)
+        page_5 = [random.randint(1, 255) for _ in range(256)]
+        page_6 = [random.randint(1, 255) for _ in range(256)]
+        memory.load(page_5, 0x500)
+        memory.load(page_6, 0x600)
+
+        # NOP and LDX, then 256 rounds of ADC ADC STA LDA INX STX STX STX JMP
+        expected = Cpu(memory.data)
+        expected.run(2 + 256 * 9)
+        lockstep = Lockstep(dut, Cpu(memory.data))
+
+        memory.start()
+        lockstep.start()
+        await helper.hold_reset(dut)
+        await with_timeout(memory.wait_for_write(0x7FF), 20, "ms")
+        memory.stop()
+        lockstep.stop()
+
+        for i in range(256):
+            assert memory[0x700 + i] == (page_5[i] + page_6[i]) % 256
+        assert memory.data[0x700:0x800] == expected.mem[0x700:0x800]
+        assert lockstep.retired >= 2 + 255 * 9
+
+
+async def run_random_program(dut, random_program, page_mode=False):
+    # a random_program.RandomProgram from the start to its write of done,
+    # with the model in lockstep
+    program = random_program.layout()
+    name = f"seed {random_program.seed}"
+    memory = Memory(dut, page_mode=page_mode)
+    program.load(memory)
+
+    expected = Cpu(memory.data, pc=program["start"])
+    expected.run(100000, until_pc=program["trap"])
+    assert expected.pc == program["trap"], f"{name} did not terminate"
+    lockstep = Lockstep(dut, Cpu(memory.data, pc=program["start"]))
+
+    await helper.hold_reset(dut)
+    memory.start()
+    lockstep.start()
+    await helper.load_state(dut, pc=program["start"])
+    await with_timeout(memory.wait_for_write(program["done"]), 20, "ms")
+    memory.stop()
+    lockstep.stop()
+
+    assert memory.data == expected.mem, f"{name} left memory different to the model"
+    assert lockstep.retired >= expected.instructions, f"{name}"
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_random_programs(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        seed = random.getrandbits(32)
+        generator = ProgramGenerator(seed, loops=0.05, self_modifying=0.1)
+        program = generator.generate(200)
+        # left behind when it fails, for python minimize.py
+        path = os.path.join("sim_build", f"random_program_{seed}.json")
+        program.save(path)
+        await run_random_program(dut, program)
+        os.remove(path)
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_page_mode_programs(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        seed = random.getrandbits(32)
+        generator = ProgramGenerator(seed, loops=0.05, self_modifying=0.1)
+        await run_random_program(dut, generator.generate(200), page_mode=True)
+
+
+@cocotb.test()
+async def test_page_mode_multiply(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        a = random.randint(0, 255)
+        b = random.randint(0, 255)
+        times = []
+        for page_mode in (False, True):
+            memory = Memory(dut, page_mode=page_mode)
+            program = assemble(MULTIPLY_PROGRAM)
+            program.load(memory)
+            memory[program["a"]] = a
+            memory[program["b"]] = b
+
+            # after the reset, which drops the strap
+            await helper.hold_reset(dut)
+            memory.start()
+            start = get_sim_time("ns")
+            await with_timeout(memory.wait_for_write(program["result"]), 2, "ms")
+            times.append(get_sim_time("ns") - start)
+            memory.stop()
+            assert memory[program["result"]] == (a * b) % 256
+
+        # all of it runs in page 0, only the write still sends the high byte
+        assert times[1] < times[0]
+
+
+@cocotb.test()
+async def test_page_mode_strobe(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    async def check_pins(strobes):
+        # the core only drives uio during a read to send the strobe, never
+        # in a clock where memory has the read data on it
+        falling_edge = FallingEdge(dut.clk)
+        while True:
+            await falling_edge
+            uio_oe = int(dut.uio_oe.value)
+            if uio_oe == 0xFF:
+                continue
+            if int(dut.uio_out.value) & PAGE_STROBE:
+                assert uio_oe == PAGE_STROBE, f"uio_oe is {uio_oe:#04x} with the strobe"
+                strobes.append(get_sim_time("ns"))
+            else:
+                assert uio_oe == 0, f"uio_oe is {uio_oe:#04x} while reading"
+
+    for _ in seeds.iterations(MAX_TESTS):
+        memory = Memory(dut, page_mode=True)
+        program = assemble(MULTIPLY_PROGRAM)
+        program.load(memory)
+        memory[program["a"]] = random.randint(0, 255)
+        memory[program["b"]] = random.randint(0, 255)
+
+        await helper.hold_reset(dut)
+        memory.start()
+        strobes = []
+        checker = cocotb.start_soon(check_pins(strobes))
+        await with_timeout(memory.wait_for_write(program["result"]), 2, "ms")
+        checker.kill()
+        memory.stop()
+
+        # the first fetch after reset has to send its page
+        assert strobes
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_debug_load_state(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+    top = dut.user_project
+
+    for _ in seeds.iterations(MAX_TEST_NUM):
+        a, x, y = (random.randint(0, 255) for _ in range(3))
+        p = random.randint(0, 127)
+        pc = random.randint(0x0100, 0xFF00)
+        await helper.hold_reset(dut)
+        await helper.load_state(dut, a, x, y, p, pc)
+
+        # the first opcode comes from the loaded pc and sees the loaded state
+        await helper.test_zpg_instruction(dut, helper.hex_to_num("85"), 0x10, pc, 0, a)
+        await helper.test_zpg_instruction(
+            dut, helper.hex_to_num("86"), 0x11, pc + 2, 0, x
+        )
+        await helper.test_zpg_instruction(
+            dut, helper.hex_to_num("84"), 0x12, pc + 4, 0, y
+        )
+        assert int(top.processor_status_register.value) == p
+
+
+@cocotb.test(skip=GL_TEST)
+async def test_debug_load_program(dut):
+    clock = Clock(dut.clk, 25, units="ns")
+    cocotb.start_soon(clock.start())
+
+    for _ in seeds.iterations(MAX_TESTS):
+        a = random.randint(0, 255)
+        b = random.randint(0, 255)
+        p = random.randint(0, 127)
+        pc = random.randint(0x01, 0xF0) << 8
+        memory = Memory(dut)
+        memory.load([helper.hex_to_num("65"), 0x20], pc)  # ADC ZPG
+        memory.load([helper.hex_to_num("85"), 0x21], pc + 2)  # STA ZPG
+        memory.load([helper.hex_to_num("4c"), (pc + 4) & 0xFF, pc >> 8], pc + 4)
+        memory[0x20] = b
+
+        cpu = Cpu(memory.data, pc=pc)
+        cpu.a, cpu.p = a, p
+        expected = Cpu(memory.data, pc=pc)
+        expected.a, expected.p = a, p
+        expected.run(100, until_pc=pc + 4)
+        lockstep = Lockstep(dut, cpu)
+
+        await helper.hold_reset(dut)
+        memory.start()
+        lockstep.start()
+        await helper.load_state(dut, a=a, p=p, pc=pc)
+        await with_timeout(memory.wait_for_write(0x21), 100, "us")
+        memory.stop()
+        lockstep.stop()
+
+        assert memory[0x21] == (a + b + (p & 1)) % 256
+        assert memory.data == expected.mem
+        assert lockstep.retired == 2
+
+
+# INCREMENTAL=1 skips the tests that passed with the same inputs last time,
+# see incremental.py
+if incremental.INCREMENTAL:
+    incremental.install(globals())
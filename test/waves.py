@@ -0,0 +1,88 @@
+import os
+from contextlib import contextmanager
+
+import cocotb
+from cocotb.triggers import Timer
+from cocotb.utils import get_sim_time
+
+# dump_scope values understood by tb.v
+SCOPES = {"all": 0, "ports": 1, "decoder": 2, "alu": 3}
+
+
+def _parse_window(text):
+    # "start:stop" in ns, either end can be left out
+    if not text:
+        return None
+    start, _, stop = text.partition(":")
+    return (int(start) if start else 0, int(stop) if stop else None)
+
+
+# make DUMP=vcd WAVES_WINDOW=120000:180000 TESTCASE=... re-dumps just the
+# part of a run around a failure, the times are the ones in the cocotb log
+WINDOW = _parse_window(os.environ.get("WAVES_WINDOW"))
+SCOPE = os.environ.get("WAVES_SCOPE", "all")
+
+
+class Waves:
+    # Switches the waveform dump in tb.v on and off. Nothing is written until
+    # the first start(), which also fixes the scope for the rest of the run.
+    # The format comes from make DUMP=vcd or DUMP=fst, without DUMP the
+    # Verilator model has no tracing built in and start() only logs that.
+    def __init__(self, dut, scope=SCOPE):
+        if scope not in SCOPES:
+            raise ValueError(f"unknown waveform scope {scope}, one of {list(SCOPES)}")
+        self.dut = dut
+        self.scope = scope
+
+    @property
+    def available(self):
+        return bool(os.environ.get("DUMP")) or not cocotb.SIM_NAME.lower().startswith(
+            "verilator"
+        )
+
+    @property
+    def dumping(self):
+        return int(self.dut.dump_enable.value) == 1
+
+    def start(self):
+        if not self.available:
+            self.dut._log.warning("no waveforms, rebuild with make DUMP=vcd or fst")
+            return
+        self.dut.dump_scope.value = SCOPES[self.scope]
+        self.dut.dump_enable.value = 1
+
+    def stop(self):
+        self.dut.dump_enable.value = 0
+
+    @contextmanager
+    def window(self):
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    async def follow(self, window):
+        # dumps between the two sim times (ns) of window, wherever we are now
+        start, stop = window
+        now = get_sim_time("ns")
+        if stop is not None and now >= stop:
+            return
+        if now < start:
+            await Timer(start - now, units="ns")
+        self.start()
+        if stop is not None:
+            await Timer(stop - max(now, start), units="ns")
+            self.stop()
+
+
+_follower = None
+
+
+def follow_environment(dut):
+    # cocotb kills every task when a test ends, so each test picks the
+    # WAVES_WINDOW follower back up from its reset
+    global _follower
+    if WINDOW is None or (_follower is not None and not _follower.done()):
+        return
+    _follower = cocotb.start_soon(Waves(dut).follow(WINDOW))